@@ -0,0 +1,70 @@
+"""Compare the paginated and stream endpoints used to download the results of an ID
+mapping job, to choose `ProtMapper.stream_threshold`.
+
+A single job is submitted for each size and its results are downloaded both ways. The
+wall time and peak memory of each download are printed as a table. `ProtMapper`
+submits jobs of at most 500 IDs, so the sizes default to that range and the target to
+a one-to-many mapping (PDB), whose jobs return several pages of results.
+
+Usage:
+    python benchmarks/bench_idmapping_stream.py --sizes 100 250 500 --repeats 3
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from UniProtMapper import ProtKB, ProtMapper
+
+
+def accessions(n: int) -> list:
+    """Retrieve reviewed human accessions to be used as input of the jobs."""
+    df = ProtKB().get(
+        "reviewed:true AND organism_id:9606", fields=["accession"], limit=n
+    )
+    return df["Entry"].tolist()
+
+
+def time_download(mapper, results_url, stream, compressed):
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_rows = sum(
+        len(page)
+        for page in mapper._iter_result_pages(
+            None, results_url, compressed, stream=stream
+        )
+    )
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return n_rows, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 250, 500])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--to-db", default="PDB")
+    parser.add_argument("--uncompressed", action="store_true")
+    args = parser.parse_args()
+
+    mapper = ProtMapper()
+    compressed = not args.uncompressed
+    pool = accessions(max(args.sizes))
+    print(f"{'ids':>8} {'mode':>9} {'rows':>8} {'seconds':>9} {'peak MiB':>9}")
+    for size in args.sizes:
+        job_id = mapper.submit_id_mapping("UniProtKB_AC-ID", args.to_db, pool[:size])
+        results_url = mapper.wait_for_job(job_id)
+        for stream, mode in [(False, "paginate"), (True, "stream")]:
+            runs = [
+                time_download(mapper, results_url, stream, compressed)
+                for _ in range(args.repeats)
+            ]
+            n_rows, elapsed, peak = min(runs, key=lambda run: run[1])
+            print(
+                f"{size:>8} {mode:>9} {n_rows:>8} {elapsed:>9.2f} {peak / 2**20:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure the cold-start cost of common entry points with `python -X importtime`.
+
+Each scenario runs in a fresh interpreter. The table reports the wall time, the total
+import time, and which heavy dependencies ended up imported. `--check` exits with an
+error if a scenario meant to be light imports pandas, numpy, requests or tqdm, so the
+script can run in CI.
+
+Usage:
+    python benchmarks/bench_import_time.py --repeats 5 --check
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+import time
+
+HEAVY = ("pandas", "numpy", "requests", "tqdm")
+
+# name -> (code, whether the scenario must not import heavy dependencies)
+SCENARIOS = {
+    "import UniProtMapper": ("import UniProtMapper", True),
+    "protmap --help": (
+        "import sys; sys.argv = ['protmap', '--help']\n"
+        "from UniProtMapper.cli import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass",
+        True,
+    ),
+    "build a QueryBuilder": (
+        "from UniProtMapper.uniprotkb_fields import organism_id, reviewed, xref_count\n"
+        "str(reviewed(True) & organism_id('9606') & xref_count('pdb', 1, '*'))",
+        True,
+    ),
+    "from UniProtMapper import ProtMapper": (
+        "from UniProtMapper import ProtMapper",
+        False,
+    ),
+}
+
+
+def run_scenario(code: str):
+    """Run `code` in a new interpreter, returning the wall time, the total import
+    time in seconds and the heavy modules that were imported."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - start
+    total_us, imported = 0, set()
+    for line in process.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if not match:
+            continue
+        cumulative, indent, module = match.groups()
+        if len(indent) == 1:  # top-level import
+            total_us += int(cumulative)
+        if module in HEAVY:
+            imported.add(module)
+    return wall, total_us / 1e6, sorted(imported)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--check", action="store_true")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'scenario':<38} {'wall s':>8} {'import s':>9}  heavy imports")
+    for name, (code, light) in SCENARIOS.items():
+        runs = [run_scenario(code) for _ in range(args.repeats)]
+        wall, import_time, imported = min(runs, key=lambda run: run[0])
+        print(f"{name:<38} {wall:>8.3f} {import_time:>9.3f}  {', '.join(imported)}")
+        if light and imported:
+            failures.append(name)
+    if args.check and failures:
+        sys.exit(f"Heavy dependencies imported by: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
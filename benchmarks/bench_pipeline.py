@@ -0,0 +1,76 @@
+"""Compare processing pages of results one at a time with the prefetching pipeline of
+`UniProtMapper.pipeline`, as used by `ProtKB` and `ProtMapper` to walk paginated
+results.
+
+The pages are synthetic gzip compressed TSV pages; downloading one is simulated with a
+fixed latency, while decompressing and parsing it is real work. Without prefetching,
+the time per page is the sum of both; with it, it approaches the slowest of them.
+
+Usage:
+    python benchmarks/bench_pipeline.py --pages 50 --latency 0.05 --depths 0 1 2 4
+"""
+
+import argparse
+import gzip
+import io
+import time
+
+import pandas as pd
+import requests
+
+from UniProtMapper.pipeline import pipeline
+from UniProtMapper.utils import iter_chunks
+
+HEADER = "Entry\tEntry Name\tLength\tOrganism (ID)\tSequence"
+
+
+def make_page(page_size: int = 500) -> bytes:
+    rows = [
+        f"P{i:06d}\tPROT{i}_HUMAN\t{100 + i % 900}\t9606\t{'MKTAYIAKQR' * 30}"
+        for i in range(page_size)
+    ]
+    return gzip.compress("\n".join([HEADER] + rows + [""]).encode())
+
+
+def download(page: bytes, n_pages: int, latency: float):
+    """Yield a streamed response per page, after waiting for its headers."""
+    for _ in range(n_pages):
+        time.sleep(latency)
+        response = requests.Response()
+        response.raw = io.BytesIO(page)
+        yield response
+
+
+def read(response: requests.Response) -> list:
+    return list(iter_chunks(response, compressed=True))
+
+
+def parse(chunks: list) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(b"".join(chunks)), sep="\t")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--depths", nargs="+", type=int, default=[0, 1, 2, 4])
+    args = parser.parse_args()
+
+    page = make_page()
+    print(f"{'depth':>6} {'seconds':>9} {'pages/s':>9}")
+    for depth in args.depths:
+        start = time.perf_counter()
+        pages = pipeline(
+            download(page, args.pages, args.latency),
+            read,
+            parse,
+            depth=depth,
+        )
+        n_rows = sum(len(df) for df in pages)
+        elapsed = time.perf_counter() - start
+        assert n_rows == args.pages * 500
+        print(f"{depth:>6} {elapsed:>9.2f} {args.pages / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare the memory used to parse the pages of a `ProtKB.get` query into a data frame
+when the pages are decoded into lines and joined into a single string, as done before,
+and when their decompressed bytes are appended to a single buffer.
+
+The pages are synthetic gzip compressed TSV pages, so no request is sent to UniProt.
+The wall time and peak (Python) memory of each parse path are printed as a table.
+
+Usage:
+    python benchmarks/bench_protkb_parse.py --rows 20000 100000 --repeats 3
+"""
+
+import argparse
+import gzip
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+
+from UniProtMapper.utils import append_tsv_page, decode_results, iter_chunks
+
+HEADER = "Entry\tEntry Name\tLength\tOrganism (ID)\tSequence"
+
+
+class Page:
+    """Minimal stand-in for a `requests.Response` holding a compressed page."""
+
+    def __init__(self, content: bytes) -> None:
+        self.content = content
+
+
+def make_pages(n_rows: int, page_size: int = 500) -> list:
+    pages = []
+    for start in range(0, n_rows, page_size):
+        rows = [
+            f"P{i:06d}\tPROT{i}_HUMAN\t{100 + i % 900}\t9606\t{'MKTAYIAKQR' * 30}"
+            for i in range(start, min(start + page_size, n_rows))
+        ]
+        pages.append(Page(gzip.compress("\n".join([HEADER] + rows + [""]).encode())))
+    return pages
+
+
+def parse_joined(pages) -> pd.DataFrame:
+    results = []
+    for page in pages:
+        lines = decode_results(page, "tsv", compressed=True)
+        results.extend(lines[1:] if results else lines)
+    return pd.read_csv(io.StringIO("\n".join(results)), sep="\t")
+
+
+def parse_buffer(pages) -> pd.DataFrame:
+    buffer = io.BytesIO()
+    for page in pages:
+        chunks = iter_chunks(page, compressed=True)
+        append_tsv_page(buffer, chunks, keep_header=buffer.tell() == 0)
+    buffer.seek(0)
+    return pd.read_csv(buffer, sep="\t")
+
+
+def measure(parse, pages):
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_rows = len(parse(pages))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return n_rows, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", nargs="+", type=int, default=[20000, 100000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'mode':>7} {'seconds':>9} {'peak MiB':>9}")
+    for n_rows in args.rows:
+        pages = make_pages(n_rows)
+        for parse, mode in [(parse_joined, "joined"), (parse_buffer, "buffer")]:
+            runs = [measure(parse, pages) for _ in range(args.repeats)]
+            _, elapsed, peak = min(runs, key=lambda run: run[1])
+            print(f"{n_rows:>8} {mode:>7} {elapsed:>9.2f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,30 @@
 """A Python wrapper for the UniProt id-mapping RESTful API: https://www.uniprot.org/id-mapping"""
 
-try:
-    from .idmapping_api import ProtMapper  # noqa: F401
-    from .uniprotkb_api import ProtKB  # noqa: F401
-except ImportError:  # when installing the package with setuptools_scm
-    pass
-
 from .version_helper import get_version
 
 __version__ = get_version()
+
+# The clients are imported on first access, so that `import UniProtMapper` doesn't
+# import pandas, numpy and requests until they're needed.
+_LAZY_IMPORTS = {
+    "AsyncProtKB": ".async_api",
+    "AsyncProtMapper": ".async_api",
+    "ProtMapper": ".idmapping_api",
+    "ProtKB": ".uniprotkb_api",
+}
+
+__all__ = list(_LAZY_IMPORTS) + ["__version__"]
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        from importlib import import_module
+
+        value = getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
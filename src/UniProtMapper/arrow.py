@@ -0,0 +1,102 @@
+"""Holds the Arrow-native result mode of `ProtMapper.get_arrow` and `ProtKB.get_arrow`:
+TSV pages are parsed straight into `pyarrow` tables, without building pandas object
+columns, and either collected into a single `pyarrow.Table` or written to a Parquet
+file as they arrive.
+
+Requires the optional dependency `pyarrow`: `pip install uniprot-id-mapper[arrow]`.
+"""
+
+import io
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from .utils import iter_chunks
+
+
+def import_pyarrow():
+    """Import pyarrow, raising an informative error if it isn't installed."""
+    try:
+        import pyarrow
+        import pyarrow.csv  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise ImportError(
+            "The Arrow result mode requires pyarrow. Install it with "
+            "`pip install uniprot-id-mapper[arrow]`"
+        ) from e
+    return pyarrow
+
+
+def arrow_type(dtype: Optional[str]):
+    """Return the Arrow type for a `dtype` of the fields table. Unknown fields are
+    read as strings."""
+    pa = import_pyarrow()
+    if dtype == "Int64":
+        return pa.int64()
+    if dtype == "Float64":
+        return pa.float64()
+    if dtype == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def page_bytes(response, compressed: bool) -> bytes:
+    """Return the (decompressed) body of a TSV page."""
+    return b"".join(iter_chunks(response, compressed))
+
+
+def parse_tsv_page(content: bytes, dtypes: Optional[Dict[str, str]] = None):
+    """Parse a TSV page, including its header, into a `pyarrow.Table`.
+
+    Args:
+        content: the decompressed body of the page.
+        dtypes: dtype of each column label, as in the `dtype` column of the fields
+            table. If None, all columns are read as strings. Defaults to None.
+    """
+    pa = import_pyarrow()
+    header_end = content.find(b"\n")
+    header = content[: header_end if header_end >= 0 else len(content)]
+    columns = header.decode("utf-8").rstrip("\r").split("\t")
+    dtypes = dtypes or {}
+    column_types = {c: arrow_type(dtypes.get(c)) for c in columns}
+    return pa.csv.read_csv(
+        io.BytesIO(content),
+        parse_options=pa.csv.ParseOptions(delimiter="\t", quote_char=False),
+        convert_options=pa.csv.ConvertOptions(
+            column_types=column_types, strings_can_be_null=False
+        ),
+    )
+
+
+class ArrowSink:
+    """Destination of the parsed pages: collects them into a single table or, if
+    `output` is given, appends them to a Parquet file as they arrive."""
+
+    def __init__(self, output: Optional[Union[str, os.PathLike]] = None) -> None:
+        self.pa = import_pyarrow()
+        self.output = None if output is None else Path(output)
+        self._tables: List = []
+        self._writer = None
+        self.num_rows = 0
+
+    def write(self, table) -> None:
+        self.num_rows += table.num_rows
+        if self.output is None:
+            self._tables.append(table)
+            return
+        if self._writer is None:
+            self._writer = self.pa.parquet.ParquetWriter(self.output, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        """Return the collected table, or the path to the written Parquet file."""
+        if self.output is None:
+            if not self._tables:
+                return self.pa.table({})
+            return self.pa.concat_tables(self._tables, promote_options="permissive")
+        if self._writer is None:  # no pages, write an empty file
+            self.pa.parquet.write_table(self.pa.table({}), self.output)
+        else:
+            self._writer.close()
+        return self.output
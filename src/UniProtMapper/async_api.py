@@ -0,0 +1,390 @@
+"""Hold asyncio counterparts of `ProtMapper` and `ProtKB`. Requests are sent through a
+single `httpx.AsyncClient`, so many mapping jobs and paginated downloads can share one
+connection pool and run concurrently on the same event loop.
+
+Requires the optional dependency `httpx`: `pip install uniprot-id-mapper[async]`.
+
+Example:
+>>> import asyncio
+>>> from UniProtMapper import AsyncProtMapper
+>>> async def main():
+>>>     async with AsyncProtMapper() as mapper:
+>>>         return await mapper.get(["P30542", "Q16678", "Q02880"], to_db="Ensembl")
+>>> result_df, failed = asyncio.run(main())
+"""
+
+import asyncio
+import os
+from logging import info, warning
+from typing import Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from .cache import MemoryCache, SQLiteCache
+from .field_base_classes import QueryBuilder
+from .idmapping_api import ProtMapper
+from .interface import BaseUniProt
+from .uniprotkb_api import ProtKB
+from .utils import (
+    decode_results,
+    divide_batches,
+    iter_ids,
+    print_progress_batches,
+)
+
+
+class AsyncBaseUniProt(BaseUniProt):
+    """Base class for the asyncio clients. Same as `BaseUniProt`, but `self.session`
+    is an `httpx.AsyncClient` and the HTTP retries are handled with `asyncio.sleep`."""
+
+    def __init__(
+        self,
+        pooling_interval: int = 3,
+        total_retries: int = 5,
+        backoff_factor: float = 0.25,
+        api_url: str = "https://rest.uniprot.org",
+        max_connections: int = 100,
+        cache: Optional[Union[MemoryCache, SQLiteCache]] = None,
+        typed: bool = False,
+    ) -> None:
+        """Initialize the class. This will set up the async client and retry mechanism.
+
+        Args:
+            pooling_interval: The interval in seconds between polling the API.
+                Defaults to 3.
+            total_retries: The total number of retries to attempt. Defaults to 5.
+            backoff_factor: The backoff factor to use when retrying. Defaults to 0.25.
+            api_url: The url for the REST API. Defaults to "https://rest.uniprot.org".
+            max_connections: Size of the connection pool shared by all requests.
+                Defaults to 100.
+            cache: cache for the retrieved results, as in `BaseUniProt`. Defaults to
+                None.
+            typed: parse the results into the dtypes of the `dtype` column of
+                `fields_table`, as in `BaseUniProt`. Defaults to False.
+        """
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError(
+                "The asyncio clients require httpx. Install it with "
+                "`pip install uniprot-id-mapper[async]`"
+            ) from e
+        self._init_state(pooling_interval, api_url, cache, typed)
+        self._total_retries = total_retries
+        self._backoff_factor = backoff_factor
+        self._retry_status = (500, 502, 503, 504)
+        self.session = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections),
+            timeout=httpx.Timeout(60.0),
+            follow_redirects=True,
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        await self.session.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs):
+        """Send a request, retrying on server errors with exponential backoff. The
+        UniProt release of the response is recorded in `uniprot_release`."""
+        for attempt in range(self._total_retries + 1):
+            response = await self.session.request(method, url, **kwargs)
+            self._record_release(response)
+            if (
+                response.status_code not in self._retry_status
+                or attempt == self._total_retries
+            ):
+                return response
+            await asyncio.sleep(self._backoff_factor * 2**attempt)
+
+    async def fetch_release(self) -> str:
+        """Asyncio counterpart of `BaseUniProt.fetch_release`."""
+        response = await self._request(
+            "GET",
+            f"{self._API_URL}/uniprotkb/search",
+            params={"query": "*", "format": "tsv", "size": 0},
+        )
+        self.check_response(response)
+        return response.headers["X-UniProt-Release"]
+
+    def check_response(self, response) -> None:
+        if response.is_error:
+            print(response.json())
+            response.raise_for_status()
+
+
+class AsyncProtMapper(AsyncBaseUniProt):
+    """Asyncio counterpart of `ProtMapper`. All methods doing requests are coroutines.
+
+    Returns:
+        Tuple[pd.DataFrame, list]: A tuple containing a data frame with the results
+        and a list of IDs that were not found.
+    """
+
+    _supported_dbs = ProtMapper._supported_dbs
+    _prepare_fields = ProtMapper._prepare_fields
+    _merge_batch_results = staticmethod(ProtMapper._merge_batch_results)
+    _to_frame = ProtMapper._to_frame
+    _cache_keys = ProtMapper._cache_keys
+    _cache_results = ProtMapper._cache_results
+    _from_cached = ProtMapper._from_cached
+
+    async def wait_for_job(self, job_id: str) -> str:
+        """Wait until the job `job_id` is finished and return its results URL. The
+        status is checked with exponential backoff, up to `pooling_interval` seconds.
+        """
+        interval = 0.25
+        while True:
+            request = await self._request(
+                "GET",
+                f"{self._API_URL}/idmapping/status/{job_id}",
+                follow_redirects=False,
+            )
+            self.check_response(request)
+            if request.is_redirect:
+                return request.headers["Location"]
+            status = request.json().get("jobStatus")
+            if status in ["RUNNING", "NEW"]:
+                await asyncio.sleep(interval)
+                interval = min(interval * 2, self._POLLING_INTERVAL)
+            elif status in [None, "FINISHED"]:
+                return await self.get_id_mapping_results_link(job_id)
+            else:
+                raise Exception(status)
+
+    async def check_id_mapping_ready(self, job_id, from_db, to_db):
+        """Wait until the job `job_id` is finished. Returns True once it is."""
+        await self.wait_for_job(job_id)
+        return True
+
+    async def submit_id_mapping(self, from_db, to_db, ids):
+        request = await self._request(
+            "POST",
+            f"{self._API_URL}/idmapping/run",
+            data={"from": from_db, "to": to_db, "ids": ",".join(ids)},
+        )
+        self.check_response(request)
+        return request.json()["jobId"]
+
+    async def get_id_mapping_results_link(self, job_id):
+        request = await self._request(
+            "GET", f"{self._API_URL}/idmapping/details/{job_id}"
+        )
+        self.check_response(request)
+        return request.json()["redirectURL"]
+
+    async def get_id_mapping_results_search(
+        self, fields: str, url: str, compressed: bool
+    ):
+        """Get the id mapping results from the UniProt API."""
+        params = {
+            "format": "tsv",
+            "fields": fields,
+            "includeIsoform": "false",
+            "size": 500,
+            "compressed": "true" if compressed else "false",
+        }
+        if fields is None:
+            params.pop("fields")
+        request = await self._request("GET", url, params=params)
+        self.check_response(request)
+        results = decode_results(request, "tsv", compressed=compressed)
+        next_link = self.get_next_link(request.headers)
+        while next_link:
+            request = await self._request("GET", next_link)
+            self.check_response(request)
+            results.extend(decode_results(request, "tsv", compressed=compressed)[1:])
+            next_link = self.get_next_link(request.headers)
+        data = [d.split("\t") for d in results]
+        return self._to_frame(data[1:], data[0])
+
+    async def _get_results(
+        self,
+        ids: List[str],
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+        compressed: bool,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Submit a single batch of up to 500 IDs and retrieve its results."""
+        job_id = await self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=ids)
+        results_url = await self.wait_for_job(job_id)
+        df = await self.get_id_mapping_results_search(fields, results_url, compressed)
+        seen = set(df["From"])
+        failed_ids = [_id for _id in ids if _id not in seen]
+        return df, failed_ids
+
+    async def get(
+        self,
+        ids: Union[Iterable[str], str, os.PathLike],
+        fields: Optional[Union[str, List]] = None,
+        from_db: str = "UniProtKB_AC-ID",
+        to_db: str = "UniProtKB-Swiss-Prot",
+        compressed: bool = True,
+        max_concurrency: int = 10,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Asyncio counterpart of `ProtMapper.get`. Batches of 500 IDs are submitted,
+        polled and retrieved concurrently on the running event loop. IDs found in
+        `self.cache` aren't submitted.
+
+        Args:
+            ids: IDs to be mapped: a single string, an iterable of strings or a path to
+                a file with one ID per line. See `ProtMapper.get`.
+            fields: list of UniProt return fields to be retrieved. See `ProtMapper.get`.
+                Defaults to None.
+            from_db: database for the ids. Defaults to "UniProtKB_AC-ID".
+            to_db: UniProtDB to query to. Defaults to "UniProtKB-Swiss-Prot".
+            compressed: compressed API request. Defaults to True.
+            max_concurrency: maximum number of batches in flight at the same time. If
+                larger than 1, a batch that raises doesn't interrupt the others; its IDs
+                are added to the list of failed IDs instead. Defaults to 10.
+
+        Raises:
+            ValueError: If parameters `from_db`or `to_db` are not supported.
+
+        Returns:
+            Tuple[pd.DataFrame, list]: First element is a data frame with the
+            results, second element is a list of failed IDs.
+        """
+        fields = self._prepare_fields(fields, from_db, to_db)
+        ids = list(iter_ids(ids))
+        batch_kwargs = dict(
+            fields=fields, from_db=from_db, to_db=to_db, compressed=compressed
+        )
+        if self.cache is None:
+            return await self._map_ids(ids, max_concurrency, **batch_kwargs)
+        keys = self._cache_keys(ids, fields, from_db, to_db)
+        cached = self.cache.get_many(keys)
+        misses = list(dict.fromkeys(i for i, k in zip(ids, keys) if k not in cached))
+        if misses:
+            errored_ids = []
+            df, _ = await self._map_ids(
+                misses, max_concurrency, errored_ids, **batch_kwargs
+            )
+            cached.update(
+                self._cache_results(misses, df, errored_ids, fields, from_db, to_db)
+            )
+        return self._from_cached(ids, keys, cached)
+
+    async def _map_ids(
+        self,
+        ids: List[str],
+        max_concurrency: int,
+        errored_ids: Optional[List[str]] = None,
+        **batch_kwargs,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Map `ids` in batches of 500, at most `max_concurrency` at a time. The IDs
+        of batches that raised an exception are appended to `errored_ids`, if given.
+        As batches complete out of order, progress is printed once all of them are
+        done.
+        """
+        batched_ids = divide_batches(ids)
+        if max_concurrency <= 1 or len(batched_ids) <= 1:
+            results = [
+                await self._get_results(batch, **batch_kwargs) for batch in batched_ids
+            ]
+            return self._report_progress(batched_ids, results)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _bounded(batch):
+            async with semaphore:
+                return await self._get_results(batch, **batch_kwargs)
+
+        results = await asyncio.gather(
+            *(_bounded(batch) for batch in batched_ids), return_exceptions=True
+        )
+        for idx, result in enumerate(results):
+            if isinstance(result, Exception):
+                warning(
+                    f"Batch {idx} ({len(batched_ids[idx])} IDs) failed with: "
+                    f"{result!r}. Its IDs will be reported as failed."
+                )
+                results[idx] = (pd.DataFrame(), list(batched_ids[idx]))
+                if errored_ids is not None:
+                    errored_ids.extend(batched_ids[idx])
+        return self._report_progress(batched_ids, results)
+
+    def _report_progress(
+        self, batched_ids: List[List[str]], results: List[Tuple[pd.DataFrame, list]]
+    ) -> Tuple[pd.DataFrame, list]:
+        """Merge the results of all batches and print the overall progress."""
+        df, failed_ids = self._merge_batch_results(results)
+        print_progress_batches(len(batched_ids) - 1, 500, len(df), len(failed_ids))
+        return df, failed_ids
+
+
+class AsyncProtKB(AsyncBaseUniProt):
+    """Asyncio counterpart of `ProtKB`. All methods doing requests are coroutines."""
+
+    _build_search_url = ProtKB._build_search_url
+    _cache_key = ProtKB._cache_key
+
+    async def get(
+        self,
+        query: Union[QueryBuilder, str],
+        fields: Optional[Union[str, List]] = None,
+        include_isoform: bool = False,
+        compressed: bool = False,
+        size: int = 500,
+    ) -> pd.DataFrame:
+        """Asyncio counterpart of `ProtKB.get`. Results are stored in and returned
+        from `self.cache`, if set.
+
+        Args:
+            query: Query string or QueryBuilder object (UniProtMapper.uniprot_kb_fields).
+            fields: list of UniProt return fields to be retrieved. See `ProtKB.get`.
+                Defaults to None.
+            include_isoform: Whether to include isoforms. Defaults to False
+            compressed: Whether to request compressed response. Defaults to False
+            size: Batch size for pagination. Defaults to 500
+
+        Returns:
+            - DataFrame with the retrieved data
+        """
+        fields = self._validate_fields(fields)
+        if fields is None:
+            info(
+                f"No fields provided. Using default fields: {', '.join(self.default_fields)}"
+            )
+            fields = list(self.default_fields)
+
+        query = str(query) if isinstance(query, QueryBuilder) else query
+        if self.cache is not None:
+            key = self._cache_key(query, fields, include_isoform)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached.copy()
+
+        url = self._build_search_url(
+            query=query,
+            fields=fields,
+            include_isoform=include_isoform,
+            compressed=compressed,
+            size=size,
+        )
+        results = []
+        while url:
+            response = await self._request("GET", url)
+            self.check_response(response)
+            batch_data = decode_results(
+                response, file_format="tsv", compressed=compressed
+            )
+            if results:
+                batch_data = batch_data[1:]
+            results.extend(batch_data)
+            url = self.get_next_link(response.headers)
+
+        df = pd.read_csv(
+            pd.io.common.StringIO("\n".join(results)),
+            sep="\t",
+            dtype=self.field_dtypes if self.typed else None,
+        )
+        if self.cache is not None:
+            self.cache.set(key, df.copy(), release=self.uniprot_release)
+        return df
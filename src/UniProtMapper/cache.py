@@ -0,0 +1,300 @@
+"""Holds the caches that can be passed to `ProtMapper` and `ProtKB` to avoid
+requesting the same results to the UniProt API more than once.
+
+- MemoryCache: in-process LRU cache with a byte budget, shared between threads.
+- SQLiteCache: persistent cache stored in a single SQLite file.
+
+Both expose the same `get_many` / `set_many` / `invalidate` interface.
+"""
+
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+
+def make_cache_key(*parts: Optional[str]) -> str:
+    """Join the parts identifying a cached result into a single key. `None` parts are
+    stored as empty strings."""
+    return "\x1f".join("" if p is None else str(p) for p in parts)
+
+
+def check_release(release: Optional[str]) -> None:
+    """Raise a ValueError if `release` is missing, so that invalidating a cache
+    against an unknown release doesn't remove all of its entries."""
+    if release is None:
+        raise ValueError(
+            "A UniProt release is required to invalidate the cache. Use e.g.: "
+            "`mapper.fetch_release()`, as `uniprot_release` is None until a "
+            "request has been sent."
+        )
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory used by `value` in bytes. Data frames are measured with
+    `DataFrame.memory_usage`, containers are measured recursively."""
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v) for v in value)
+    elif isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return size
+
+
+class MemoryCache:
+    """Thread-safe, in-process LRU cache. The least recently used entries are evicted
+    once the estimated size of the stored values exceeds `max_bytes`, and entries
+    older than `ttl` seconds are treated as missing.
+
+    Hits, misses and evictions are counted in the `stats` attribute:
+
+    >>> cache = MemoryCache(max_bytes=256 * 2**20, ttl=3600)
+    >>> mapper, protkb = ProtMapper(cache=cache), ProtKB(cache=cache)
+    >>> cache.stats
+    {'hits': 0, 'misses': 0, 'evictions': 0}
+    """
+
+    def __init__(self, max_bytes: int = 256 * 2**20, ttl: Optional[float] = None):
+        """Initialize the cache.
+
+        Args:
+            max_bytes: memory budget for the stored values, in bytes. Defaults to
+                256 MiB.
+            ttl: time to live of the entries in seconds. If None, entries never
+                expire. Defaults to None.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = OrderedDict()  # key -> (value, size, release, created)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries and not self._expired(self._entries[key])
+
+    def _expired(self, entry: tuple) -> bool:
+        return self.ttl is not None and time.time() - entry[3] > self.ttl
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return a dictionary with the values found for `keys`. Missing and expired
+        keys are left out."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self._expired(entry):
+                    self._pop(key)
+                    entry = None
+                if entry is None:
+                    self.stats["misses"] += 1
+                    continue
+                self.stats["hits"] += 1
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+        return found
+
+    def set(self, key: str, value: Any, release: Optional[str] = None) -> None:
+        self.set_many([(key, value)], release=release)
+
+    def set_many(
+        self, items: Iterable[Tuple[str, Any]], release: Optional[str] = None
+    ) -> None:
+        """Store the `(key, value)` pairs, recording the UniProt `release` they were
+        retrieved from, and evict the least recently used entries if needed. Values
+        larger than the whole budget aren't stored."""
+        now = time.time()
+        with self._lock:
+            for key, value in items:
+                size = estimate_size(value)
+                if key in self._entries:
+                    self._pop(key)
+                if size > self.max_bytes:
+                    continue
+                self._entries[key] = (value, size, release, now)
+                self.size += size
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def _pop(self, key: str) -> None:
+        self.size -= self._entries.pop(key)[1]
+
+    def invalidate(self, release: str) -> int:
+        """Remove the entries that weren't retrieved from the UniProt `release`, e.g.:
+        as returned by `ProtMapper.fetch_release`, and the expired ones. Returns the
+        number of removed entries.
+
+        Raises:
+            ValueError: If `release` is None, e.g.: `uniprot_release` of a client that
+                hasn't sent any request yet.
+        """
+        check_release(release)
+        with self._lock:
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if entry[2] != release or self._expired(entry)
+            ]
+            for key in stale:
+                self._pop(key)
+        return len(stale)
+
+
+class SQLiteCache:
+    """Persistent key-value cache stored in a SQLite database. Values are pickled and
+    compressed with zlib. The least recently used entries are evicted once the cache
+    grows beyond `max_bytes`, and entries older than `ttl` seconds are ignored.
+
+    Each entry records the UniProt release it was retrieved from, so that the cache
+    can be invalidated when a new release is out:
+
+    >>> cache = SQLiteCache("~/.cache/uniprot_mapper.sqlite", ttl=7 * 24 * 3600)
+    >>> mapper = ProtMapper(cache=cache)
+    >>> cache.invalidate(release=mapper.fetch_release())  # drop older releases
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: int = 2**30,
+        ttl: Optional[float] = None,
+    ) -> None:
+        """Open (or create) the cache.
+
+        Args:
+            path: path to the SQLite file.
+            max_bytes: maximum size of the stored (compressed) values in bytes.
+                Defaults to 1 GiB.
+            ttl: time to live of the entries in seconds. If None, entries never
+                expire. Defaults to None.
+        """
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB, size INTEGER, release TEXT, "
+            "created REAL, accessed REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.get_many([key])
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return a dictionary with the values found for `keys`. Missing and expired
+        keys are left out."""
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # SQLite limits the variables
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value, created FROM entries WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, value, created in rows:
+                    if self.ttl is not None and now - created > self.ttl:
+                        continue
+                    found[key] = value
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(keys) - len(found)
+            self._conn.executemany(
+                "UPDATE entries SET accessed = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self._conn.commit()
+        return {k: pickle.loads(zlib.decompress(v)) for k, v in found.items()}
+
+    def set(self, key: str, value: Any, release: Optional[str] = None) -> None:
+        self.set_many([(key, value)], release=release)
+
+    def set_many(
+        self, items: Iterable[Tuple[str, Any]], release: Optional[str] = None
+    ) -> None:
+        """Store the `(key, value)` pairs, recording the UniProt `release` they were
+        retrieved from, and evict the least recently used entries if needed."""
+        now = time.time()
+        rows = []
+        for key, value in items:
+            blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            rows.append((key, blob, len(blob), release, now, now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries")
+        excess = total.fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed ASC"
+        ):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.stats["evictions"] += len(evicted)
+
+    def invalidate(self, release: str) -> int:
+        """Remove the entries that weren't retrieved from the UniProt `release`, e.g.:
+        as returned by `ProtMapper.fetch_release`, and the expired ones. Returns the
+        number of removed entries.
+
+        Raises:
+            ValueError: If `release` is None, e.g.: `uniprot_release` of a client that
+                hasn't sent any request yet.
+        """
+        check_release(release)
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE release IS NOT ?", (release,)
+            )
+            removed = cursor.rowcount
+            if self.ttl is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM entries WHERE created < ?", (time.time() - self.ttl,)
+                )
+                removed += cursor.rowcount
+            self._conn.commit()
+        return removed
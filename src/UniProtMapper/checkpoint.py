@@ -0,0 +1,121 @@
+"""Holds MappingCheckpoint: a journal of the batches submitted by `ProtMapper.get`, so
+that an interrupted run can be resumed without redoing the finished batches."""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from .utils import apply_dtypes
+
+
+class MappingCheckpoint:
+    """Journal of a mapping run, stored in `directory`. For each batch of IDs, the
+    journal records the ID of the submitted job and, once the batch is finished, its
+    failed IDs. The results of finished batches are stored as TSV files next to the
+    journal (`<batch key>.tsv`).
+
+    Batches are identified by a hash of their IDs and of the mapping parameters, so
+    the same directory can be shared by runs with different inputs. Rerunning with
+    the same inputs skips the finished batches and reattaches to the jobs that were
+    submitted but not retrieved yet.
+
+    Example:
+    >>> result_df, failed = mapper.get(ids, to_db="Ensembl", checkpoint_dir="run/")
+    >>> # killed halfway; the same call now only maps the missing batches
+    >>> result_df, failed = mapper.get(ids, to_db="Ensembl", checkpoint_dir="run/")
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, os.PathLike],
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+        dtypes: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Open (or create) the checkpoint directory and read its journal.
+
+        Args:
+            directory: directory holding the journal and the results of each batch.
+            fields: comma-separated return fields of the run, or None.
+            from_db: database of the mapped IDs.
+            to_db: database the IDs are mapped to.
+            dtypes: dtypes the results of a typed run are cast to when loaded, see
+                `apply_dtypes`. Typed and untyped runs don't share batches. Defaults
+                to None, i.e.: an untyped run.
+        """
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dtypes = dtypes
+        params = [fields or "", from_db, to_db] + (["typed"] if dtypes else [])
+        self._params = "\x1f".join(params)
+        self._journal = self.directory / "journal.jsonl"
+        self._lock = threading.Lock()
+        self.job_ids: Dict[str, str] = {}
+        self.failed: Dict[str, List[str]] = {}
+        if self._journal.exists():
+            with self._journal.open("r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:  # truncated by an interruption
+                        continue
+                    if "job_id" in entry:
+                        self.job_ids[entry["batch"]] = entry["job_id"]
+                    if "failed" in entry:
+                        self.failed[entry["batch"]] = entry["failed"]
+
+    def batch_key(self, batch: List[str]) -> str:
+        """Return the key identifying `batch` in the journal."""
+        content = "\n".join([self._params] + list(batch))
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def _append(self, entry: dict) -> None:
+        with self._lock:
+            with self._journal.open("a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def job_id(self, batch: List[str]) -> Optional[str]:
+        """Return the ID of the job submitted for `batch`, if any."""
+        return self.job_ids.get(self.batch_key(batch))
+
+    def record_job(self, batch: List[str], job_id: str) -> None:
+        """Record that `batch` was submitted as `job_id`."""
+        key = self.batch_key(batch)
+        self.job_ids[key] = job_id
+        self._append({"batch": key, "job_id": job_id})
+
+    def load(self, batch: List[str]) -> Optional[Tuple[pd.DataFrame, list]]:
+        """Return the results and failed IDs of `batch` if it was finished by a
+        previous run, otherwise None."""
+        key = self.batch_key(batch)
+        if key not in self.failed:
+            return None
+        path = self.directory / f"{key}.tsv"
+        if not path.exists():
+            return pd.DataFrame(), list(self.failed[key])
+        df = pd.read_csv(path, sep="\t", dtype=str, keep_default_na=False)
+        if self.dtypes:
+            df = apply_dtypes(df, self.dtypes)
+        return df, list(self.failed[key])
+
+    def save(self, batch: List[str], df: pd.DataFrame, failed_ids: list) -> None:
+        """Store the results of a finished batch. The TSV file is written before the
+        journal entry, so a batch is never marked as finished with partial results."""
+        key = self.batch_key(batch)
+        if len(df.columns):
+            tmp_path = self.directory / f"{key}.tsv.tmp"
+            df.to_csv(tmp_path, sep="\t", index=False)
+            os.replace(tmp_path, self.directory / f"{key}.tsv")
+        self.failed[key] = list(failed_ids)
+        self._append({"batch": key, "failed": list(failed_ids)})
+
+    def __len__(self) -> int:
+        return len(self.failed)
@@ -7,8 +7,6 @@ from io import StringIO
 from itertools import cycle
 from pathlib import Path
 
-from .idmapping_api import ProtMapper
-
 CROSSREF_PATH = Path(__file__).parent / "resources/uniprot_mapping_dbs.json"
 FIELDS_CONFIG_PATH = Path(__file__).parent / "resources/cli_return_fields.txt"
 
@@ -81,7 +79,8 @@ def parse_arguments() -> argparse.Namespace:
         default=None,
         help=(
             "Path to the output file to write the returned fields. "
-            "If not provided, will write to stdout. "
+            "If not provided, will write to stdout. Paths ending in .parquet are "
+            "written as Parquet, which requires pyarrow. "
         ),
     )
     parser.add_argument(
@@ -118,6 +117,8 @@ def parse_arguments() -> argparse.Namespace:
     )
 
     if any(["--print-fields" in sys.argv, "-pf" in sys.argv]):
+        from .idmapping_api import ProtMapper
+
         print("Available return fields:")
         result = ProtMapper().fields_table
         csv_io = StringIO(result.to_csv(index=False))
@@ -132,19 +133,13 @@ def main():
         DEFAULT_FIELDS = f.read().splitlines()
 
     args = parse_arguments()
+    from .idmapping_api import ProtMapper  # imported after parsing, for a fast --help
 
     field_retriever = ProtMapper(
         pooling_interval=5, total_retries=5, backoff_factor=0.5
     )
     if args.default_fields:
         args.return_fields = DEFAULT_FIELDS
-    result, failed = field_retriever.get(
-        args.ids, fields=args.return_fields, from_db=args.from_db, to_db=args.to_db
-    )
-    field_retriever.session.close()
-    if failed:
-        print(f"Failed to retrieve {len(failed)} IDs:\n {failed}")
-
     if args.output is not None:
         output_path = Path(args.output)
         if output_path.exists():
@@ -153,6 +148,27 @@ def main():
                     f"Input file {output_path} already exists. "
                     "Use parameter --overwrite to overwrite it."
                 )
+    if args.output is not None and output_path.suffix == ".parquet":
+        _, failed = field_retriever.get_arrow(
+            args.ids,
+            fields=args.return_fields,
+            from_db=args.from_db,
+            to_db=args.to_db,
+            output=output_path,
+        )
+        field_retriever.session.close()
+        if failed:
+            print(f"Failed to retrieve {len(failed)} IDs:\n {failed}")
+        return
+
+    result, failed = field_retriever.get(
+        args.ids, fields=args.return_fields, from_db=args.from_db, to_db=args.to_db
+    )
+    field_retriever.session.close()
+    if failed:
+        print(f"Failed to retrieve {len(failed)} IDs:\n {failed}")
+
+    if args.output is not None:
         result.to_csv(args.output, index=False)
     else:
         csv_io = StringIO(result.to_csv(index=False))
@@ -6,14 +6,13 @@ Used to create the fields within UniProtMapper.uniprot_kb_fields
 import re
 from typing import List, Union
 
-from .utils import read_fields_table
+from .registry import get_registry
 
-XREF_FIELDS = (
-    read_fields_table()
-    .query("returned_field.str.match('xref_')")["returned_field"]
-    .str.replace("xref_", "")
-    .to_list()
-)
+
+def __getattr__(name):
+    if name == "XREF_FIELDS":  # loaded lazily to keep the import cheap
+        return list(get_registry().xref_databases_order)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class QueryBuilder:
@@ -265,9 +264,11 @@ class XRefCountField:
 
     def _xref_check(self, xref):
         xref = xref.replace("xref_", "") if xref.startswith("xref_") else xref
-        if xref not in XREF_FIELDS:
+        registry = get_registry()
+        if xref not in registry.xref_databases:
             raise ValueError(
-                f"{xref} is not a valid field. Please check the available fields: \n {XREF_FIELDS}"
+                f"{xref} is not a valid field. Please check the available fields: \n "
+                f"{list(registry.xref_databases_order)}"
             )
         return xref
 
@@ -1,24 +1,42 @@
 """Holds ProtMapper: a class for returning specific fields from UniProt. For
-a list of all supported fields, see https://www.uniprot.org/help/return_fields. 
+a list of all supported fields, see https://www.uniprot.org/help/return_fields.
 
 Supported fields also stored as a data frame in the `fields_table` attribute.
 """
 
+import os
+import re
+import threading
 import time
-from logging import warning
-from typing import List, Optional, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import chain, islice
+from logging import info, warning
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from urllib.parse import parse_qs, urlparse
 
-import numpy as np
 import pandas as pd
 import requests
 
+from .arrow import ArrowSink, page_bytes, parse_tsv_page
+from .cache import MemoryCache, SQLiteCache, make_cache_key
+from .checkpoint import MappingCheckpoint
 from .interface import BaseUniProt
+from .jobs import JobRegistry, MappingJob, job_key
+from .pipeline import pipeline
+from .polling import JobPoller, summarize_durations
+from .registry import get_registry
 from .utils import (
+    apply_dtypes,
+    concat_frames,
     decode_results,
+    deduplicate_ids,
     divide_batches,
+    iter_batches,
+    iter_ids,
+    iter_lines,
     print_progress_batches,
-    supported_mapping_dbs,
 )
 
 
@@ -30,6 +48,18 @@ class ProtMapper(BaseUniProt):
         Tuple[pd.DataFrame, list]: A tuple containing a data frame with the results
         and a list of IDs that were not found.
 
+    Results of jobs with more than `stream_threshold` rows are downloaded in a single
+    request to the stream endpoint instead of 500-row pages. Jobs hold at most 500
+    IDs, so only one-to-many mappings (e.g.: to PDB or Ensembl) return more than a
+    page of results. Above two pages, the stream saves at least two round trips for
+    the cost of downloading the first page again, hence the default of 1000 rows; the
+    crossover can be measured with `benchmarks/bench_idmapping_stream.py`. Pages are requested up to
+    `prefetch` pages ahead of the download, decompression and parsing of their
+    bodies, see `UniProtMapper.pipeline`; set it to 0 to process them one at a time.
+
+    The number of round trips and bytes received for each submitted job are stored in
+    the `job_stats` attribute, as `{job_id: {"round_trips": int, "bytes": int}}`.
+
     Example:
     >>> from UniProtMapper import ProtMapper
     >>> mapper = ProtMapper()
@@ -38,80 +68,276 @@ class ProtMapper(BaseUniProt):
     >>>                                         "go_p", "go_c", "go_f"])
     """
 
+    stream_threshold = 1000
+    prefetch = 2
+
     def __init__(
         self,
         pooling_interval: int = 3,
         total_retries: int = 5,
         backoff_factor: float = 0.25,
         api_url: str = "https://rest.uniprot.org",
+        cache: Optional[Union[MemoryCache, SQLiteCache]] = None,
+        job_registry: Optional[JobRegistry] = None,
+        typed: bool = False,
     ) -> None:
         """Initialize the class. This will set up the session and retry mechanism.
 
         Args:
-            pooling_interval: The interval in seconds between polling the API.
-                Defaults to 3.
+            pooling_interval: The maximum interval in seconds between polling the
+                status of a job. Jobs are first checked after 0.25 s, and the interval
+                doubles after each check until reaching this value. Defaults to 3.
             total_retries: The total number of retries to attempt. Defaults to 5.
             backoff_factor: The backoff factor to use when retrying. Defaults to 0.25.
             api_url: The url for the REST API. Defaults to "https://rest.uniprot.org".
+            cache: cache consulted by `get` for each mapped ID, e.g.: a `MemoryCache`
+                or a `SQLiteCache` from `UniProtMapper.cache`. Only the IDs missing
+                from the cache are submitted to the API. Defaults to None.
+            job_registry: registry of the jobs created by `submit`, used to reuse the
+                job previously submitted for the same IDs and databases instead of
+                creating a new one. See `UniProtMapper.jobs.JobRegistry`. Defaults to
+                None.
+            typed: parse the results into the dtypes of `field_dtypes` (nullable
+                integers and floats, categoricals and Arrow-backed strings) instead of
+                object columns. Defaults to False.
         """
         super().__init__(
             pooling_interval,
             total_retries,
             backoff_factor,
             api_url,
+            cache,
+            typed,
+        )
+        self.job_registry = job_registry
+        self.time_to_ready = []
+        self.dedup_stats = {}
+        self._case_insensitive_dbs = ("UniProtKB_AC-ID", "UniParc")
+        self.job_stats = {}
+        self._job_stats_lock = threading.Lock()
+        self._re_job_url = re.compile(
+            r"/idmapping/(?:uniprotkb/)?(?:status|details|results)/(?:stream/)?([^/?#]+)"
         )
+        self.session.hooks["response"].append(self._record_job_traffic)
 
     @property
     def _supported_dbs(self) -> list:
-        return supported_mapping_dbs()
+        return list(get_registry().mapping_dbs_order)
+
+    def _prepare_fields(
+        self, fields: Optional[Union[str, List]], from_db: str, to_db: str
+    ) -> Optional[str]:
+        """Validate the databases and return fields of a mapping request, returning
+        the fields as the comma-separated string expected by the API."""
+        mapping_dbs = get_registry().mapping_dbs
+        if from_db not in mapping_dbs or to_db not in mapping_dbs:
+            raise ValueError(
+                f"either {from_db} or {to_db} is not available. "
+                f"Supported databases are {self._supported_dbs}"
+            )
+        fields = self._validate_fields(fields)
+        if to_db not in ["UniProtKB-Swiss-Prot", "UniProtKB"]:
+            if fields is not None:
+                warning(
+                    f"Custom fields not available when querying {to_db}.\n"
+                    "Setting fields to `None` to retrieve all available fields..."
+                )
+                fields = None
+        if fields is not None:
+            fields = ",".join(fields)
+        return fields
 
-    def _get_batch(self, batch_response, file_format, compressed):
+    def _get_batch(self, batch_response) -> Iterator[requests.Response]:
+        """Follow the `Link` headers from `batch_response`, yielding the responses of
+        the next pages. Their bodies are streamed, so they are only downloaded once
+        they are read, e.g.: with `iter_lines`."""
         batch_url = self.get_next_link(batch_response.headers)
         while batch_url:
-            batch_response = self.session.get(batch_url)
+            batch_response = self.session.get(batch_url, stream=True)
             batch_response.raise_for_status()
-            yield decode_results(batch_response, file_format, compressed)
+            yield batch_response
             batch_url = self.get_next_link(batch_response.headers)
 
-    def _combine_batches(self, all_results, batch_results, file_format):
-        if file_format == "json":
-            for key in ("results", "failedIds"):
-                if key in batch_results and batch_results[key]:
-                    all_results[key] += batch_results[key]
-        elif file_format == "tsv":
-            return all_results + batch_results[1:]
-        else:
-            return all_results + batch_results
-        return all_results
+    def _new_poller(self) -> JobPoller:
+        """Return a poller for the status of jobs submitted through this session."""
+        poller = JobPoller(
+            self.session, self._API_URL, max_interval=self._POLLING_INTERVAL
+        )
+        poller.time_to_ready = self.time_to_ready
+        return poller
+
+    def polling_stats(self) -> dict:
+        """Return the distribution of the time, in seconds, between submitting and
+        detecting the completion of the jobs submitted by this instance."""
+        return summarize_durations(self.time_to_ready)
+
+    def _record_job_traffic(self, response, *args, **kwargs) -> None:
+        """Response hook counting the round trips and bytes received for each job.
+        The bodies of streamed responses aren't downloaded yet; their bytes are
+        counted as they are read, see `_byte_counter`."""
+        match = self._re_job_url.search(response.url)
+        if match is None:
+            return
+        n_bytes = 0 if kwargs.get("stream") else len(response.content)
+        self._add_job_traffic(match.group(1), n_bytes)
+
+    def _byte_counter(self, response) -> Optional[Callable[[int], None]]:
+        """Return an `on_chunk` callback for `iter_chunks`, adding the bytes read from
+        the streamed `response` to the `job_stats` of its job."""
+        match = self._re_job_url.search(response.url)
+        if match is None:
+            return None
+        return partial(self._add_job_traffic, match.group(1), round_trips=0)
+
+    def _add_job_traffic(self, job_id: str, n_bytes: int, round_trips: int = 1) -> None:
+        with self._job_stats_lock:
+            stats = self.job_stats.setdefault(job_id, {"round_trips": 0, "bytes": 0})
+            stats["round_trips"] += round_trips
+            stats["bytes"] += n_bytes
+
+    def _results_url(self, job_id: str, status_response) -> str:
+        """Return the results URL of a finished job from its final status response.
+        The API redirects finished jobs to their results; the `/details` endpoint is
+        only requested if the redirect is missing."""
+        if status_response.is_redirect:
+            return status_response.headers["Location"]
+        return self.get_id_mapping_results_link(job_id)
+
+    def wait_for_job(self, job_id: str) -> str:
+        """Block until the job `job_id` is finished and return its results URL."""
+        poller = self._new_poller()
+        poller.add(job_id)
+        for _, outcome in poller.poll():
+            if isinstance(outcome, Exception):
+                raise outcome
+            return self._results_url(job_id, outcome)
 
     def check_id_mapping_ready(self, job_id, from_db, to_db):
-        while True:
-            request = self.session.get(f"{self._API_URL}/idmapping/status/{job_id}")
-            self.check_response(request)
-            j = request.json()
-            if "jobStatus" in j:
-                if j["jobStatus"] in ["RUNNING", "NEW"]:
-                    print(f"Retrying in {self._POLLING_INTERVAL}s")
-                    time.sleep(self._POLLING_INTERVAL)
-                else:
-                    raise Exception(j["jobStatus"])
-            else:
-                try:
-                    ready = bool(j["results"] or j["failedIds"])
-                except KeyError:
-                    raise requests.RequestException(
-                        f"Unexpected response from {from_db} to {to_db}.\n"
-                        'request.json() missing "results" and "failedIds"'
-                    )
-                return ready
+        """Block until the job `job_id` is finished. Returns True once it is."""
+        self.wait_for_job(job_id)
+        return True
 
     def submit_id_mapping(self, from_db, to_db, ids):
-        request = requests.post(
+        request = self.session.post(
             f"{self._API_URL}/idmapping/run",
             data={"from": from_db, "to": to_db, "ids": ",".join(ids)},
         )
         self.check_response(request)
-        return request.json()["jobId"]
+        job_id = request.json()["jobId"]
+        self._add_job_traffic(job_id, len(request.content))
+        return job_id
+
+    def _submit_batch(
+        self,
+        from_db: str,
+        to_db: str,
+        batch: List[str],
+        checkpoint: Optional[MappingCheckpoint] = None,
+    ) -> str:
+        """Submit `batch` and return its job ID. If `checkpoint` holds a job for the
+        same batch and the API still knows it, that job is reattached instead."""
+        if checkpoint is not None:
+            job_id = checkpoint.job_id(batch)
+            if job_id is not None:
+                if self._job_available(job_id):
+                    info(f"Reattached to job {job_id}")
+                    return job_id
+                info(f"Job {job_id} is no longer available, resubmitting its batch")
+        job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=batch)
+        if checkpoint is not None:
+            checkpoint.record_job(batch, job_id)
+        return job_id
+
+    def _check_job_status(self, job_id: str) -> requests.Response:
+        """Send a single status request, without following the redirect sent once the
+        job is finished."""
+        return self.session.get(
+            f"{self._API_URL}/idmapping/status/{job_id}", allow_redirects=False
+        )
+
+    def _job_available(self, job_id: str) -> bool:
+        """Whether the API still holds the job `job_id`."""
+        return self._check_job_status(job_id).ok
+
+    def submit(
+        self,
+        ids: Union[Iterable[str], str, os.PathLike],
+        from_db: str = "UniProtKB_AC-ID",
+        to_db: str = "UniProtKB-Swiss-Prot",
+    ) -> MappingJob:
+        """Submit a mapping job without waiting for it, returning a serializable
+        handle to collect the results later with `fetch`. If `self.job_registry` holds
+        a job for the same IDs and databases that is still available, it is returned
+        instead of submitting a new one.
+
+        Args:
+            ids: up to 500 IDs to be mapped. See `get`.
+            from_db: database for the ids. Defaults to "UniProtKB_AC-ID".
+            to_db: UniProtDB to query to. Defaults to "UniProtKB-Swiss-Prot".
+
+        Raises:
+            ValueError: If `from_db` or `to_db` are not supported, or if more than 500
+                IDs are passed.
+
+        Returns:
+            MappingJob: the handle of the submitted job.
+
+        Example:
+        >>> jobs = [mapper.submit(batch, to_db="Ensembl") for batch in divide_batches(ids)]
+        >>> # ...later
+        >>> for job in jobs:
+        >>>     for page, failed in mapper.fetch(job):
+        >>>         ...
+        """
+        self._prepare_fields(None, from_db, to_db)
+        ids = list(iter_ids(ids))
+        if len(ids) > 500:
+            raise ValueError(
+                f"A job holds at most 500 IDs, got {len(ids)}. "
+                "Split them with `UniProtMapper.utils.divide_batches`."
+            )
+        if self.job_registry is not None:
+            job = self.job_registry.get(job_key(ids, from_db, to_db))
+            if job is not None and self._job_available(job.job_id):
+                info(f"Reusing job {job.job_id}")
+                return job
+        job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=ids)
+        job = MappingJob(job_id=job_id, from_db=from_db, to_db=to_db, ids=ids)
+        if self.job_registry is not None:
+            self.job_registry.add(job)
+        return job
+
+    def job_status(self, job: MappingJob) -> str:
+        """Return the status of a submitted job, e.g.: "RUNNING" or "FINISHED"."""
+        request = self._check_job_status(job.job_id)
+        self.check_response(request)
+        if request.is_redirect:
+            return "FINISHED"
+        return request.json().get("jobStatus", "FINISHED")
+
+    def fetch(
+        self,
+        job: MappingJob,
+        fields: Optional[Union[str, List]] = None,
+        compressed: bool = True,
+    ) -> Iterator[Tuple[pd.DataFrame, list]]:
+        """Wait for a job created by `submit` to finish and yield its results page by
+        page, as in `iter_get`.
+
+        Args:
+            job: handle returned by `submit`, possibly restored with
+                `MappingJob.from_json`.
+            fields: list of UniProt return fields to be retrieved. See `get`.
+                Defaults to None.
+            compressed: compressed API request. Defaults to True.
+
+        Yields:
+            Tuple[pd.DataFrame, list]: a data frame with a page of results and a list
+            of failed IDs, yielded with the last page.
+        """
+        fields = self._prepare_fields(fields, job.from_db, job.to_db)
+        results_url = self.wait_for_job(job.job_id)
+        yield from self._iter_batch_pages(results_url, job.ids, fields, compressed)
 
     def get_id_mapping_results_link(self, job_id):
         url = f"{self._API_URL}/idmapping/details/{job_id}"
@@ -122,7 +348,7 @@ class ProtMapper(BaseUniProt):
     def get_id_mapping_results_stream(self, url):
         if "/stream/" not in url:
             url = url.replace("/results/", "/results/stream/")
-        request = self.session.get(url)
+        request = self.session.get(url, stream=True)
         self.check_response(request)
         parsed = urlparse(url)
         query = parse_qs(parsed.query)
@@ -130,43 +356,635 @@ class ProtMapper(BaseUniProt):
         compressed = (
             query["compressed"][0].lower() == "true" if "compressed" in query else False
         )
-        return decode_results(request, file_format, compressed)
+        return decode_results(
+            request, file_format, compressed, on_chunk=self._byte_counter(request)
+        )
 
-    def get_id_mapping_results_search(self, fields: str, url: str, compressed: bool):
-        """Get the id mapping results from the UniProt API."""
+    def _results_params(self, fields: Optional[str], compressed: bool) -> dict:
         query_dict = {
             "format": "tsv",
             "fields": fields,
             "includeIsoform": "false",
             "size": 500,
-            "compressed": {"true" if compressed else "false"},
+            "compressed": "true" if compressed else "false",
         }
         if fields is None:
             query_dict.pop("fields")
-        self.check_response(self.session.get(url, allow_redirects=False))
-        request = requests.get(url + "/", params=query_dict)
-        results = decode_results(request, "tsv", compressed=compressed)
-        for i, batch in enumerate(self._get_batch(request, "tsv", compressed), 1):
-            results = self._combine_batches(results, batch, "tsv")
-        data = [d.split("\t") for d in results]
-        columns = data[0]
-        results_df = pd.DataFrame(data=data[1:], columns=columns)
-        return results_df
+        return query_dict
+
+    def _iter_result_pages(
+        self,
+        fields: Optional[str],
+        url: str,
+        compressed: bool,
+        stream: Optional[bool] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Yield a data frame for each page of results of a finished job, as they
+        arrive. Only one page is held in memory at a time.
+
+        If `stream` is None, the first page is requested from the paginated endpoint
+        and, if the job has more than `self.stream_threshold` results, the remaining
+        ones are downloaded from the stream endpoint instead.
+        """
+        if stream:
+            yield from self._iter_stream_pages(fields, url, compressed)
+            return
+        query_dict = self._results_params(fields, compressed)
+        request = self.session.get(url, params=query_dict, stream=True)
+        self.check_response(request)
+        total_results = int(request.headers.get("x-total-results", 0))
+        if stream is None and total_results > self.stream_threshold:
+            request.close()  # the first page is downloaded again by the stream
+            yield from self._iter_stream_pages(fields, url, compressed)
+            return
+        # the next page is requested while the current one is downloaded and parsed
+        yield from pipeline(
+            chain([request], self._get_batch(request)),
+            partial(self._read_page, compressed=compressed),
+            self._parse_page,
+            depth=self.prefetch,
+        )
+
+    def _read_page(self, response, compressed: bool) -> List[str]:
+        """Download the streamed body of a TSV page, decompressing and splitting it
+        into lines incrementally with `iter_lines`."""
+        with response:
+            on_chunk = self._byte_counter(response)
+            return list(iter_lines(response, compressed=compressed, on_chunk=on_chunk))
+
+    def _parse_page(self, lines: List[str]) -> pd.DataFrame:
+        """Build a data frame from the lines of a TSV page, including its header."""
+        columns = lines[0].split("\t")
+        return self._to_frame([line.split("\t") for line in lines[1:]], columns)
+
+    def _to_frame(self, rows: list, columns: List[str]) -> pd.DataFrame:
+        """Build a data frame from parsed TSV rows, casting the columns to the dtypes
+        of `self.field_dtypes` if `self.typed`."""
+        df = pd.DataFrame(rows, columns=columns)
+        return apply_dtypes(df, self.field_dtypes) if self.typed else df
+
+    def _iter_stream_pages(
+        self, fields: Optional[str], url: str, compressed: bool, rows: int = 5000
+    ) -> Iterator[pd.DataFrame]:
+        """Download all results of a finished job in a single request to the stream
+        endpoint, decoding it incrementally and yielding data frames of `rows` rows."""
+        if "/stream/" not in url:
+            url = url.replace("/results/", "/results/stream/")
+        query_dict = self._results_params(fields, compressed)
+        query_dict.pop("size")
+        with self.session.get(url, params=query_dict, stream=True) as request:
+            self.check_response(request)
+            on_chunk = self._byte_counter(request)
+            lines = iter_lines(request, compressed=compressed, on_chunk=on_chunk)
+            columns = next(lines).split("\t")
+            first_page = True
+            while True:
+                page = [line.split("\t") for line in islice(lines, rows)]
+                if page or first_page:
+                    yield self._to_frame(page, columns)
+                if len(page) < rows:
+                    break
+                first_page = False
+
+    def get_id_mapping_results_search(self, fields: str, url: str, compressed: bool):
+        """Get the id mapping results from the UniProt API. `url` is the results URL
+        of a finished job, as returned by `wait_for_job`."""
+        pages = list(self._iter_result_pages(fields, url, compressed))
+        return concat_frames(pages) if len(pages) > 1 else pages[0]
+
+    def _iter_batch_pages(
+        self,
+        results_url: str,
+        ids: List[str],
+        fields: Optional[str],
+        compressed: bool,
+    ) -> Iterator[Tuple[pd.DataFrame, list]]:
+        """Yield `(page, failed_ids)` for each page of results of a finished job. The
+        IDs of `ids` missing from all pages are reported with the last page; the other
+        pages are yielded with an empty list."""
+        seen = set()
+        retrieved = 0
+        pages = self._iter_result_pages(fields, results_url, compressed)
+        page = next(pages)
+        for next_page in pages:  # look one page ahead to know which one is the last
+            seen.update(page["From"])
+            retrieved += len(page)
+            yield page, []
+            page = next_page
+        seen.update(page["From"])
+        retrieved += len(page)
+        failed_ids = [_id for _id in ids if _id not in seen]
+        print_progress_batches(0, 500, retrieved, len(failed_ids))
+        yield page, failed_ids
+
+    def _iter_mapping_pages(
+        self,
+        ids: Iterable[str],
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+        compressed: bool,
+    ) -> Iterator[Tuple[pd.DataFrame, list]]:
+        """Submit `ids` in batches of 500, one after another, yielding the pages of
+        results of each batch as they arrive. `ids` is consumed lazily."""
+        for batch in iter_batches(ids):  # The API only allows 500 ids per request
+            job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=batch)
+            results_url = self.wait_for_job(job_id)
+            yield from self._iter_batch_pages(results_url, batch, fields, compressed)
+
+    def _fetch_results(
+        self,
+        results_url: str,
+        ids: List[str],
+        fields: Optional[str],
+        compressed: bool,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Retrieve the results of a finished job, computing the failed IDs."""
+        pages = self._iter_batch_pages(results_url, ids, fields, compressed)
+        return self._merge_batch_results(list(pages))
+
+    @staticmethod
+    def _merge_batch_results(
+        results: List[Tuple[pd.DataFrame, list]],
+    ) -> Tuple[pd.DataFrame, list]:
+        """Concatenate the per-batch (or per-page) data frames and failed IDs, keeping
+        their order. The data frames are concatenated once, in linear time."""
+        if len(results) == 1:
+            return results[0]
+        all_dfs = [df for df, _ in results if len(df.columns)]
+        failed_ids = [_id for _, failed in results for _id in failed]
+        df = concat_frames(all_dfs) if all_dfs else pd.DataFrame()
+        return df, failed_ids
+
+    def _run_batches_concurrently(
+        self,
+        batched_ids: List[List[str]],
+        max_workers: int,
+        fields: Union[Optional[str], List[Optional[str]]],
+        from_db: str,
+        to_db: Union[str, List[str]],
+        compressed: bool,
+        checkpoint: Optional[MappingCheckpoint] = None,
+        errored_ids: Optional[List[str]] = None,
+    ) -> List[Tuple[pd.DataFrame, list]]:
+        """Submit and retrieve the batches on a bounded thread pool, while the status
+        of the submitted jobs is tracked by a single `JobPoller`. At most
+        `max_workers` jobs are outstanding, i.e.: submitted and not yet retrieved; the
+        next batch is submitted as soon as one of them is retrieved or fails. Results
+        are returned in the same order as `batched_ids`, regardless of completion
+        order. A batch raising an exception doesn't interrupt the others; its IDs are
+        reported as failed instead and, if `errored_ids` is given, appended to it.
+        Finished batches are saved to `checkpoint`, if given.
+
+        `fields` and `to_db` can also be lists holding a value for each batch, so that
+        batches of different mappings share the same pool."""
+        if max_workers > self._pool_maxsize:
+            self._setup_session(pool_maxsize=max_workers)
+        results = [None] * len(batched_ids)
+        if not isinstance(fields, list):
+            fields = [fields] * len(batched_ids)
+        if not isinstance(to_db, list):
+            to_db = [to_db] * len(batched_ids)
+        pending = iter(range(len(batched_ids)))
+        poller = self._new_poller()
+        submissions, jobs, fetches = {}, {}, {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+            def _submit_next():
+                idx = next(pending, None)
+                if idx is not None:
+                    future = executor.submit(
+                        self._submit_batch,
+                        from_db,
+                        to_db[idx],
+                        batched_ids[idx],
+                        checkpoint,
+                    )
+                    submissions[future] = idx
+
+            def _failed_batch(idx, error):
+                warning(
+                    f"Batch {idx} ({len(batched_ids[idx])} IDs) failed with: "
+                    f"{error!r}. Its IDs will be reported as failed."
+                )
+                results[idx] = (pd.DataFrame(), list(batched_ids[idx]))
+                if errored_ids is not None:
+                    errored_ids.extend(batched_ids[idx])
+                _submit_next()
+
+            for _ in range(max_workers):
+                _submit_next()
+            while submissions or fetches or len(poller):
+                # wait for a submission or a fetch, until the next status check is due
+                timeout = poller.next_due()
+                if submissions or fetches:
+                    done, _ = wait(
+                        [*submissions, *fetches],
+                        timeout=timeout,
+                        return_when=FIRST_COMPLETED,
+                    )
+                else:
+                    done = set()
+                    time.sleep(timeout)
+                for future in done:
+                    if future in submissions:
+                        idx = submissions.pop(future)
+                        try:
+                            job_id = future.result()
+                        except Exception as e:
+                            _failed_batch(idx, e)
+                            continue
+                        jobs[job_id] = idx
+                        poller.add(job_id)
+                        continue
+                    idx = fetches.pop(future)
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        _failed_batch(idx, e)
+                        continue
+                    if checkpoint is not None:
+                        checkpoint.save(batched_ids[idx], *results[idx])
+                    _submit_next()
+
+                for job_id, outcome in poller.poll_due():
+                    idx = jobs.pop(job_id)
+                    try:
+                        if isinstance(outcome, Exception):
+                            raise outcome
+                        results_url = self._results_url(job_id, outcome)
+                    except Exception as e:
+                        _failed_batch(idx, e)
+                        continue
+                    future = executor.submit(
+                        self._fetch_results,
+                        results_url,
+                        batched_ids[idx],
+                        fields[idx],
+                        compressed,
+                    )
+                    fetches[future] = idx
+        return results
+
+    def get_many(
+        self,
+        ids: Union[Iterable[str], str, os.PathLike],
+        targets: List[str],
+        fields: Optional[Union[str, List]] = None,
+        from_db: str = "UniProtKB_AC-ID",
+        compressed: bool = True,
+        max_workers: int = 8,
+        deduplicate: bool = False,
+        long_format: bool = False,
+    ) -> Tuple[Union[Dict[str, pd.DataFrame], pd.DataFrame], Dict[str, list]]:
+        """Map the same IDs to several databases at once. The batches of all targets
+        are scheduled on a single thread pool and connection pool, so the whole call
+        takes about as long as the slowest target.
+
+        Args:
+            ids: IDs to be mapped. See `get`.
+            targets: databases to map the IDs to, e.g.: ["PDB", "Ensembl", "STRING"].
+            fields: return fields for the UniProtKB targets. See `get`. Defaults to
+                None.
+            from_db: database for the ids. Defaults to "UniProtKB_AC-ID".
+            compressed: compressed API request. Defaults to True.
+            max_workers: number of batches, of any target, in flight at the same time.
+                A batch that raises doesn't interrupt the others; its IDs are reported
+                as failed for its target. Defaults to 8.
+            deduplicate: normalize the IDs and submit each distinct ID once per target,
+                as in `get`. Defaults to False.
+            long_format: return a single data frame with the columns `From`, `Target`
+                and `To` (the `Entry` column, for UniProtKB targets) instead of a data
+                frame per target. Defaults to False.
+
+        Raises:
+            ValueError: If `from_db` or any of the `targets` is not supported.
+
+        Returns:
+            Tuple[Union[Dict[str, pd.DataFrame], pd.DataFrame], Dict[str, list]]: First
+            element holds the results, as a data frame per target or in long format.
+            Second element holds the failed IDs of each target.
+
+        Example:
+        >>> results, failed = mapper.get_many(ids, targets=["PDB", "Ensembl"])
+        >>> results["PDB"]
+        """
+        targets = list(dict.fromkeys(targets))
+        target_fields = [self._prepare_fields(fields, from_db, t) for t in targets]
+        ids = list(iter_ids(ids))
+        submitted_ids = ids
+        if deduplicate:
+            submitted_ids, normalized = deduplicate_ids(
+                ids, upper=from_db in self._case_insensitive_dbs
+            )
+        batched_ids = divide_batches(submitted_ids)
+        n_batches = len(batched_ids)
+        results = self._run_batches_concurrently(
+            batched_ids * len(targets),
+            max_workers,
+            [f for f in target_fields for _ in range(n_batches)],
+            from_db,
+            [t for t in targets for _ in range(n_batches)],
+            compressed,
+        )
+        per_target, failed = {}, {}
+        for idx, target in enumerate(targets):
+            df, failed_ids = self._merge_batch_results(
+                results[idx * n_batches : (idx + 1) * n_batches]
+            )
+            if deduplicate:
+                df, failed_ids = self._expand_to_input(df, failed_ids, ids, normalized)
+            per_target[target], failed[target] = df, failed_ids
+        if not long_format:
+            return per_target, failed
+        long_dfs = [
+            pd.DataFrame(
+                {
+                    "From": df["From"],
+                    "Target": target,
+                    "To": df["Entry" if "Entry" in df.columns else "To"],
+                }
+            )
+            for target, df in per_target.items()
+            if len(df.columns)
+        ]
+        columns = ["From", "Target", "To"]
+        if not long_dfs:
+            return pd.DataFrame(columns=columns), failed
+        return pd.concat(long_dfs, ignore_index=True), failed
+
+    def _map_batch(
+        self,
+        batch: List[str],
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+        compressed: bool,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Submit a single batch, wait for it and retrieve its results."""
+        job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=batch)
+        results_url = self.wait_for_job(job_id)
+        return self._fetch_results(results_url, batch, fields, compressed)
+
+    def _plan_path(
+        self, path: List[str], fields: Optional[Union[str, List]]
+    ) -> List[Tuple[str, str, Optional[str], str]]:
+        """Return the `(from_db, to_db, fields, id_column)` of each hop of `path`.
+        Intermediate UniProtKB hops only retrieve the accession, which is submitted to
+        the next hop as a `UniProtKB_AC-ID`."""
+        if len(path) < 2:
+            raise ValueError("A mapping path needs at least two databases.")
+        hops = []
+        for idx, (from_db, to_db) in enumerate(zip(path[:-1], path[1:])):
+            if idx and from_db in ["UniProtKB", "UniProtKB-Swiss-Prot"]:
+                from_db = "UniProtKB_AC-ID"
+            is_kb = to_db in ["UniProtKB", "UniProtKB-Swiss-Prot"]
+            last = idx == len(path) - 2
+            hop_fields = self._prepare_fields(
+                fields if last else (["accession"] if is_kb else None), from_db, to_db
+            )
+            hops.append((from_db, to_db, hop_fields, "Entry" if is_kb else "To"))
+        return hops
+
+    def get_path(
+        self,
+        ids: Union[Iterable[str], str, os.PathLike],
+        path: List[str],
+        fields: Optional[Union[str, List]] = None,
+        compressed: bool = True,
+        max_workers: int = 4,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Map IDs through a sequence of databases, e.g.: Ensembl → UniProtKB → PDB.
+        Hops are pipelined: as soon as a batch of a hop finishes, its mapped IDs are
+        queued for the next hop and submitted in batches of 500, without waiting for
+        the whole hop to finish.
+
+        Args:
+            ids: IDs from `path[0]` to be mapped. See `get`.
+            path: databases to map through, as listed in `_supported_dbs`. UniProtKB
+                accessions are mapped onwards from "UniProtKB_AC-ID".
+            fields: return fields of the last hop, if it targets UniProtKB. See `get`.
+                Defaults to None.
+            compressed: compressed API request. Defaults to True.
+            max_workers: number of batches, of any hop, in flight at the same time.
+                A batch that raises doesn't interrupt the others; its IDs are treated
+                as failed. Defaults to 4.
+
+        Raises:
+            ValueError: If `path` has less than two databases or holds an unsupported
+                database.
+
+        Returns:
+            Tuple[pd.DataFrame, list]: First element is a data frame joining the hops,
+            with the input IDs in `From`, one column per intermediate database and the
+            columns of the last hop. Second element is a list of the input IDs that
+            couldn't be mapped to the last database.
+
+        Example:
+        >>> result_df, failed = mapper.get_path(ids, ["Ensembl", "UniProtKB", "PDB"])
+        """
+        hops = self._plan_path(path, fields)
+        ids = list(iter_ids(ids))
+        results = [[] for _ in hops]  # (batch number, result) of each hop
+        queued = [[] for _ in hops]
+        seen = [set() for _ in hops]
+        n_batches = [0 for _ in hops]
+        if max_workers > self._pool_maxsize:
+            self._setup_session(pool_maxsize=max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {}
+
+            def _launch(hop, batch):
+                from_db, to_db, hop_fields, _ = hops[hop]
+                future = executor.submit(
+                    self._map_batch, batch, hop_fields, from_db, to_db, compressed
+                )
+                running[future] = (hop, n_batches[hop], batch)
+                n_batches[hop] += 1
+
+            for batch in divide_batches(ids):
+                _launch(0, batch)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    hop, number, batch = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        warning(
+                            f"Batch {number} of hop {hop} ({len(batch)} IDs) failed "
+                            f"with: {e!r}. Its IDs will be treated as failed."
+                        )
+                        result = (pd.DataFrame(), list(batch))
+                    results[hop].append((number, result))
+                    if hop + 1 < len(hops) and len(result[0].columns):
+                        for _id in result[0][hops[hop][3]]:
+                            if _id not in seen[hop + 1]:
+                                seen[hop + 1].add(_id)
+                                queued[hop + 1].append(_id)
+                        while len(queued[hop + 1]) >= 500:
+                            _launch(hop + 1, queued[hop + 1][:500])
+                            queued[hop + 1] = queued[hop + 1][500:]
+                # a partial batch is only submitted once the previous hops are done
+                for hop in range(1, len(hops)):
+                    previous_running = any(h < hop for h, _, _ in running.values())
+                    if queued[hop] and not previous_running:
+                        _launch(hop, queued[hop])
+                        queued[hop] = []
+        return self._join_hops(ids, path, hops, results)
+
+    @staticmethod
+    def _join_hops(
+        ids: List[str],
+        path: List[str],
+        hops: List[Tuple[str, str, Optional[str], str]],
+        results: List[List[Tuple[int, Tuple[pd.DataFrame, list]]]],
+    ) -> Tuple[pd.DataFrame, list]:
+        """Join the results of each hop into a single table, from the input IDs to
+        the last database."""
+        joined = None
+        for hop, hop_results in enumerate(results):
+            hop_results = [
+                result for _, result in sorted(hop_results, key=lambda r: r[0])
+            ]
+            df, _ = (
+                ProtMapper._merge_batch_results(hop_results)
+                if hop_results
+                else (
+                    pd.DataFrame(),
+                    [],
+                )
+            )
+            if not len(df.columns):
+                return pd.DataFrame(), list(ids)
+            if hop < len(hops) - 1:
+                id_column = hops[hop][3]
+                df = df[["From", id_column]].rename(columns={id_column: path[hop + 1]})
+            if joined is None:
+                joined = df
+            else:
+                df = df.rename(columns={"From": path[hop]})
+                joined = joined.merge(df, on=path[hop], how="inner")
+        mapped = set(joined["From"])
+        return joined.reset_index(drop=True), [i for i in ids if i not in mapped]
+
+    def _iter_arrow_pages(self, fields: Optional[str], url: str, compressed: bool):
+        """Yield a `pyarrow.Table` for each page of results of a finished job."""
+        dtypes = get_registry().label_dtypes if self.typed else None
+        request = self.session.get(url, params=self._results_params(fields, compressed))
+        while True:
+            self.check_response(request)
+            yield parse_tsv_page(page_bytes(request, compressed), dtypes)
+            next_link = self.get_next_link(request.headers)
+            if not next_link:
+                break
+            request = self.session.get(next_link)
+
+    def get_arrow(
+        self,
+        ids: Union[Iterable[str], str, os.PathLike],
+        fields: Optional[Union[str, List]] = None,
+        from_db: str = "UniProtKB_AC-ID",
+        to_db: str = "UniProtKB-Swiss-Prot",
+        compressed: bool = True,
+        output: Optional[Union[str, os.PathLike]] = None,
+    ):
+        """Arrow-native version of `get`: the TSV pages are parsed straight into
+        `pyarrow` tables, skipping pandas altogether. Batches of 500 IDs are submitted
+        one after another. Requires `pyarrow`.
+
+        Args:
+            ids: IDs to be mapped. See `get`.
+            fields: list of UniProt return fields to be retrieved. See `get`.
+                Defaults to None.
+            from_db: database for the ids. Defaults to "UniProtKB_AC-ID".
+            to_db: UniProtDB to query to. Defaults to "UniProtKB-Swiss-Prot".
+            compressed: compressed API request. Defaults to True.
+            output: path to a Parquet file. If given, each page is appended to the
+                file as it arrives instead of being kept in memory. Defaults to None.
+
+        Returns:
+            Tuple[Union[pyarrow.Table, Path], list]: First element is a table with the
+            results (or the path to `output`, if given), second element is a list of
+            failed IDs. All columns are strings, unless the mapper is `typed`.
+
+        Example:
+        >>> table, failed = mapper.get_arrow(ids, output="results.parquet")
+        """
+        fields = self._prepare_fields(fields, from_db, to_db)
+        sink = ArrowSink(output)
+        failed_ids = []
+        for batch in iter_batches(iter_ids(ids)):
+            job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=batch)
+            results_url = self.wait_for_job(job_id)
+            seen = set()
+            for table in self._iter_arrow_pages(fields, results_url, compressed):
+                seen.update(table.column("From").to_pylist())
+                sink.write(table)
+            failed_ids.extend(_id for _id in batch if _id not in seen)
+            print_progress_batches(0, 500, sink.num_rows, len(failed_ids))
+        return sink.close(), failed_ids
+
+    def iter_get(
+        self,
+        ids: Union[Iterable[str], str, os.PathLike],
+        fields: Optional[Union[str, List]] = None,
+        from_db: str = "UniProtKB_AC-ID",
+        to_db: str = "UniProtKB-Swiss-Prot",
+        compressed: bool = True,
+    ) -> Iterator[Tuple[pd.DataFrame, list]]:
+        """Streaming version of `get`, yielding the results page by page as they are
+        retrieved, so that only one page (500 rows) is held in memory at a time.
+        Batches of 500 IDs are submitted one after another.
+
+        Args:
+            ids: IDs to be mapped, consumed lazily. See `get`.
+            fields: list of UniProt return fields to be retrieved. See `get`.
+                Defaults to None.
+            from_db: database for the ids. Defaults to "UniProtKB_AC-ID".
+            to_db: UniProtDB to query to. Defaults to "UniProtKB-Swiss-Prot".
+            compressed: compressed API request. Defaults to True.
+
+        Yields:
+            Tuple[pd.DataFrame, list]: a data frame with a page of results and a list
+            of failed IDs. The failed IDs of each batch are yielded with its last page;
+            the list is empty for the other pages.
+
+        Example:
+        >>> for page, failed in mapper.iter_get(ids, to_db="Ensembl"):
+        >>>     page.to_csv("mapped.csv", mode="a", header=False, index=False)
+        """
+        fields = self._prepare_fields(fields, from_db, to_db)
+        yield from self._iter_mapping_pages(
+            iter_ids(ids),
+            fields=fields,
+            from_db=from_db,
+            to_db=to_db,
+            compressed=compressed,
+        )
 
     def get(
         self,
-        ids: Union[List[str], str],
+        ids: Union[Iterable[str], str, os.PathLike],
         fields: Optional[Union[str, List]] = None,
         from_db: str = "UniProtKB_AC-ID",
         to_db: str = "UniProtKB-Swiss-Prot",
         compressed: bool = True,
-    ) -> Tuple[pd.DataFrame, list]:
+        max_workers: int = 1,
+        deduplicate: bool = False,
+        output: Optional[Union[str, os.PathLike]] = None,
+        checkpoint_dir: Optional[Union[str, os.PathLike]] = None,
+    ) -> Tuple[Union[pd.DataFrame, Path], list]:
         """Gets the requested fields from the UniProt ID Mapping API.
         Supported fields are listed in the `fields_table` attribute. For a complete
         list of the supported fields, check: https://www.uniprot.org/help/return_fields
 
         Args:
-            ids: list of IDs to be mapped or single string.
+            ids: IDs to be mapped. Either a single string, any iterable of strings
+                (e.g.: a generator), or a path-like object (e.g.: `pathlib.Path`) to a
+                file with one ID per line.
             fields: list of UniProt return fields to be retrieved. If None, will return the
                 API's default fields. `default` can also be passsed to access `self.default_fields`.
                 **Note** parameter not supported for datasets that aren't strictly UniProtKB,
@@ -176,70 +994,290 @@ class ProtMapper(BaseUniProt):
                 you want to include unreviewed accessions, use "UniProtKB". Defaults to
                 "UniProtKB-Swiss-Prot".
             compressed: compressed API request. Defaults to True.
+            max_workers: number of batches of 500 IDs to submit and retrieve at the
+                same time. If larger than 1, batches run on a thread pool and a batch
+                that raises doesn't interrupt the others; its IDs are added to the
+                list of failed IDs instead. Defaults to 1 (sequential).
+            deduplicate: strip whitespace from the IDs (and make them uppercase, for
+                UniProt accessions and UniParc IDs) and submit each distinct ID only
+                once. The results are then expanded back to the order and multiplicity
+                of `ids`. The number of saved submissions is stored in
+                `self.dedup_stats`. Defaults to False.
+            output: path to a TSV file where the results are written. If given, `ids`
+                is consumed lazily in windows of `500 * max_workers` IDs and the
+                results of each window are appended to the file, so that memory use
+                doesn't depend on the number of IDs. With `deduplicate`, duplicates are
+                only collapsed within each window. Defaults to None.
+            checkpoint_dir: directory where submitted jobs and finished batches are
+                journaled (see `UniProtMapper.checkpoint.MappingCheckpoint`). Rerunning
+                with the same inputs and directory skips the finished batches and
+                reattaches to the jobs still available on the server. Defaults to None.
 
         Raises:
             ValueError: If parameters `from_db`or `to_db` are not supported.
 
         Returns:
-            Tuple[pd.DataFrame, list]: First element is a data frame with the
-            results, second element is a list of failed IDs.
+            Tuple[Union[pd.DataFrame, Path], list]: First element is a data frame with
+            the results (or the path to `output`, if given), second element is a list
+            of failed IDs.
+
+        Example:
+        >>> mapper.get(Path("ids.txt"), to_db="Ensembl", output="mapped.tsv")
+        (PosixPath('mapped.tsv'), [...])
         """
-        if any([from_db not in self._supported_dbs, to_db not in self._supported_dbs]):
-            raise ValueError(
-                f"either {from_db} or {to_db} is not available. "
-                f"Supported databases are {self._supported_dbs}"
+        fields = self._prepare_fields(fields, from_db, to_db)
+        batch_kwargs = dict(
+            fields=fields, from_db=from_db, to_db=to_db, compressed=compressed
+        )
+        if checkpoint_dir is not None:
+            batch_kwargs["checkpoint"] = MappingCheckpoint(
+                checkpoint_dir,
+                fields,
+                from_db,
+                to_db,
+                dtypes=self.field_dtypes if self.typed else None,
             )
-        if fields is not None:
-            if fields == "default":
-                fields = self.default_fields
-            else:
-                fields = np.char.lower(np.array(fields))
-                if not np.isin(fields, self.supported_return_fields).all():
-                    raise ValueError(
-                        "Invalid fields. Valid fields are: "
-                        f"{self.supported_return_fields}"
-                    )
-        if to_db not in ["UniProtKB-Swiss-Prot", "UniProtKB"]:
-            if fields is not None:
-                warning(
-                    f"Custom fields not available when querying {to_db}.\n"
-                    "Setting fields to `None` to retrieve all available fields..."
-                )
-                fields = None
+        if output is not None:
+            return self._map_to_file(
+                iter_ids(ids), Path(output), max_workers, deduplicate, **batch_kwargs
+            )
+        return self._map_window(
+            list(iter_ids(ids)), max_workers, deduplicate, **batch_kwargs
+        )
 
-        if isinstance(ids, str):
-            ids = [ids]
+    def _map_to_file(
+        self,
+        ids: Iterator[str],
+        output: Path,
+        max_workers: int,
+        deduplicate: bool,
+        **batch_kwargs,
+    ) -> Tuple[Path, list]:
+        """Map `ids` in windows of `500 * max_workers` IDs, appending the results of
+        each window to the TSV file `output`. Only one window is held in memory."""
+        failed_ids = []
+        header = True
+        with output.open("w", newline="") as f:
+            for window in iter_batches(ids, 500 * max(max_workers, 1)):
+                df, failed = self._map_window(
+                    window, max_workers, deduplicate, **batch_kwargs
+                )
+                failed_ids.extend(failed)
+                if len(df.columns):
+                    df.to_csv(f, sep="\t", index=False, header=header)
+                    header = False
+        return output, failed_ids
 
-        if fields is not None:
-            fields = ",".join(fields)
+    def _map_window(
+        self,
+        ids: List[str],
+        max_workers: int,
+        deduplicate: bool,
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+        compressed: bool,
+        checkpoint: Optional[MappingCheckpoint] = None,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Map a list of IDs, optionally deduplicating them and consulting the cache."""
+        submitted_ids = ids
+        if deduplicate:
+            submitted_ids, normalized = deduplicate_ids(
+                ids, upper=from_db in self._case_insensitive_dbs
+            )
+            self.dedup_stats = {
+                "input": len(normalized),
+                "submitted": len(submitted_ids),
+                "saved": len(normalized) - len(submitted_ids),
+            }
+            info(f"Deduplication saved {self.dedup_stats['saved']} submissions")
 
-        def _get_results(
-            ids,
+        batch_kwargs = dict(
             fields=fields,
             from_db=from_db,
             to_db=to_db,
             compressed=compressed,
-        ):
-            job_id = self.submit_id_mapping(from_db=from_db, to_db=to_db, ids=ids)
-            if self.check_id_mapping_ready(job_id, from_db=from_db, to_db=to_db):
-                link = self.get_id_mapping_results_link(job_id)
-                df = self.get_id_mapping_results_search(fields, link, compressed)
-                retrieved = len(df["From"].values)
-                failed_arr = np.isin(ids, df["From"].values, invert=True)
-                n_failed = failed_arr.astype(int).sum()
-                failed_ids = np.compress(failed_arr, ids).tolist()
-                print_progress_batches(0, 500, retrieved, n_failed)
-                return df, failed_ids
-
-        if len(ids) > 500:  # The API only allows 500 ids per request
-            batched_ids = divide_batches(ids)
-            all_dfs = []
-            failed_ids = []
-            for batch in batched_ids:
-                df, failed = _get_results(batch)
-                all_dfs.append(df)
-                failed_ids = failed_ids + failed
-            df = pd.concat(all_dfs, ignore_index=True) if all_dfs else pd.DataFrame()
-            return df, failed_ids
+            checkpoint=checkpoint,
+        )
+        if self.cache is not None:
+            df, failed_ids = self._map_ids_cached(
+                submitted_ids, max_workers, **batch_kwargs
+            )
+        else:
+            df, failed_ids = self._map_ids(submitted_ids, max_workers, **batch_kwargs)
+        if deduplicate:
+            return self._expand_to_input(df, failed_ids, ids, normalized)
+        return df, failed_ids
+
+    @staticmethod
+    def _expand_to_input(
+        df: pd.DataFrame, failed_ids: list, ids: List[str], normalized: List[str]
+    ) -> Tuple[pd.DataFrame, list]:
+        """Expand the results of deduplicated IDs back to the order and multiplicity of
+        the input `ids`. `normalized` holds the submitted version of each input ID."""
+        positions = df.groupby("From", sort=False).indices if len(df) else {}
+        order, from_values = [], []
+        for _id, norm in zip(ids, normalized):
+            rows = positions.get(norm, [])
+            order.extend(rows)
+            from_values.extend([_id] * len(rows))
+        expanded = df.take(order).reset_index(drop=True) if len(df.columns) else df
+        if len(expanded.columns):
+            expanded["From"] = from_values
+        failed_set = set(failed_ids)
+        failed = [_id for _id, norm in zip(ids, normalized) if norm in failed_set]
+        return expanded, failed
+
+    def _map_ids(
+        self,
+        ids: List[str],
+        max_workers: int,
+        checkpoint: Optional[MappingCheckpoint] = None,
+        errored_ids: Optional[List[str]] = None,
+        **batch_kwargs,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Map `ids` in batches of 500, sequentially or on a thread pool. The IDs of
+        concurrent batches that raised an exception, rather than finishing without
+        results, are appended to `errored_ids`, if given."""
+        batched_ids = divide_batches(ids)  # The API only allows 500 ids per request
+        if checkpoint is not None:
+            results = self._map_batches_checkpointed(
+                batched_ids, max_workers, checkpoint, errored_ids, **batch_kwargs
+            )
+        elif max_workers > 1 and len(batched_ids) > 1:
+            results = self._run_batches_concurrently(
+                batched_ids, max_workers, errored_ids=errored_ids, **batch_kwargs
+            )
+        else:
+            results = list(self._iter_mapping_pages(ids, **batch_kwargs))
+        return self._merge_batch_results(results)
+
+    def _map_batches_checkpointed(
+        self,
+        batched_ids: List[List[str]],
+        max_workers: int,
+        checkpoint: MappingCheckpoint,
+        errored_ids: Optional[List[str]],
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+        compressed: bool,
+    ) -> List[Tuple[pd.DataFrame, list]]:
+        """Map the batches missing from `checkpoint` and load the others from it,
+        returning the results in the order of `batched_ids`."""
+        results = [checkpoint.load(batch) for batch in batched_ids]
+        pending = [idx for idx, result in enumerate(results) if result is None]
+        info(
+            f"Checkpoint: {len(batched_ids) - len(pending)} / {len(batched_ids)} "
+            "batches already finished"
+        )
+        pending_batches = [batched_ids[idx] for idx in pending]
+        if max_workers > 1 and len(pending_batches) > 1:
+            new_results = self._run_batches_concurrently(
+                pending_batches,
+                max_workers,
+                fields,
+                from_db,
+                to_db,
+                compressed,
+                checkpoint=checkpoint,
+                errored_ids=errored_ids,
+            )
         else:
-            return _get_results(ids)
+            new_results = []
+            for batch in pending_batches:
+                job_id = self._submit_batch(from_db, to_db, batch, checkpoint)
+                results_url = self.wait_for_job(job_id)
+                result = self._fetch_results(results_url, batch, fields, compressed)
+                checkpoint.save(batch, *result)
+                new_results.append(result)
+        for idx, result in zip(pending, new_results):
+            results[idx] = result
+        return results
+
+    def _map_ids_cached(
+        self,
+        ids: List[str],
+        max_workers: int,
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+        compressed: bool,
+        checkpoint: Optional[MappingCheckpoint] = None,
+    ) -> Tuple[pd.DataFrame, list]:
+        """Same as `_map_ids`, but IDs found in `self.cache` aren't submitted. Each
+        cached value holds the columns and rows mapped from a single ID, with no rows
+        for IDs that failed to map. IDs of batches that raised an exception aren't
+        cached, so they're submitted again by the next call. Results are returned in
+        the order of `ids`."""
+        keys = self._cache_keys(ids, fields, from_db, to_db)
+        cached = self.cache.get_many(keys)
+        misses = list(dict.fromkeys(i for i, k in zip(ids, keys) if k not in cached))
+        if misses:
+            errored_ids = []
+            df, _ = self._map_ids(
+                misses,
+                max_workers,
+                fields=fields,
+                from_db=from_db,
+                to_db=to_db,
+                compressed=compressed,
+                checkpoint=checkpoint,
+                errored_ids=errored_ids,
+            )
+            cached.update(
+                self._cache_results(misses, df, errored_ids, fields, from_db, to_db)
+            )
+        else:
+            info(f"All {len(ids)} IDs were found in the cache")
+        return self._from_cached(ids, keys, cached)
+
+    def _cache_keys(
+        self, ids: List[str], fields: Optional[str], from_db: str, to_db: str
+    ) -> List[str]:
+        """Return the cache key of each ID of `ids` for the given mapping."""
+        typed = "typed" if self.typed else None
+        return [
+            make_cache_key("idmapping", from_db, to_db, fields, typed, i) for i in ids
+        ]
+
+    def _cache_results(
+        self,
+        ids: List[str],
+        df: pd.DataFrame,
+        errored_ids: List[str],
+        fields: Optional[str],
+        from_db: str,
+        to_db: str,
+    ) -> dict:
+        """Split the results `df` of mapping `ids` into the cache values of each ID and
+        store them in `self.cache`, except for `errored_ids`. Returns the values of
+        all `ids`, by cache key."""
+        columns = df.columns.tolist()
+        rows = df.values.tolist()
+        positions = df.groupby("From", sort=False).indices if len(df) else {}
+        keys = self._cache_keys(ids, fields, from_db, to_db)
+        new_entries = {
+            key: (columns, [rows[i] for i in positions.get(_id, [])])
+            for _id, key in zip(ids, keys)
+        }
+        errored = set(self._cache_keys(errored_ids, fields, from_db, to_db))
+        self.cache.set_many(
+            [(k, v) for k, v in new_entries.items() if k not in errored],
+            release=self.uniprot_release,
+        )
+        return new_entries
+
+    def _from_cached(
+        self, ids: List[str], keys: List[str], cached: dict
+    ) -> Tuple[pd.DataFrame, list]:
+        """Assemble the results of `ids` from their cached values, in order."""
+        columns, all_rows, failed_ids = None, [], []
+        for _id, key in zip(ids, keys):
+            id_columns, id_rows = cached[key]
+            if id_rows:
+                columns = columns or id_columns
+                all_rows.extend(id_rows)
+            else:
+                failed_ids.append(_id)
+        return self._to_frame(all_rows, columns), failed_ids
@@ -2,11 +2,14 @@
 
 import re
 from abc import ABC
+from typing import Optional, Union
 
 import requests
 from requests.adapters import HTTPAdapter, Retry
 
-from .utils import read_fields_table
+from .cache import MemoryCache, SQLiteCache
+from .registry import get_registry
+from .utils import read_fields_table, resolve_dtype
 
 """
 Several methods were either taken or adapted from the Python example for the
@@ -15,6 +18,19 @@ https://www.uniprot.org/help/id_mapping#submitting-an-id-mapping-job
 """
 
 
+class _FieldsTable:
+    """Descriptor loading the fields table (see `read_fields_table`) on first access
+    instead of when the class is defined, so that importing the package is cheap."""
+
+    def __init__(self) -> None:
+        self._table = None
+
+    def __get__(self, instance, owner):
+        if self._table is None:
+            self._table = read_fields_table()
+        return self._table
+
+
 class BaseUniProt(ABC):
     """Base class for the UniProt rest APIs covered by this package:
 
@@ -22,7 +38,7 @@ class BaseUniProt(ABC):
     - BaseUniProt -> ProtKB (UniProtKB API)
     """
 
-    fields_table = read_fields_table()
+    fields_table = _FieldsTable()
     default_fields = (
         "accession",
         "id",
@@ -44,6 +60,8 @@ class BaseUniProt(ABC):
         total_retries: int = 5,
         backoff_factor: float = 0.25,
         api_url: str = "https://rest.uniprot.org",
+        cache: Optional[Union[MemoryCache, SQLiteCache]] = None,
+        typed: bool = False,
     ) -> None:
         """Initialize the class. This will set up the session and retry mechanism.
 
@@ -53,28 +71,76 @@ class BaseUniProt(ABC):
             total_retries: The total number of retries to attempt. Defaults to 5.
             backoff_factor: The backoff factor to use when retrying. Defaults to 0.25.
             api_url: The url for the REST API. Defaults to "https://rest.uniprot.org".
+            cache: cache for the retrieved results, e.g.: a `MemoryCache` shared by
+                several clients or a persistent `SQLiteCache`, both found in
+                `UniProtMapper.cache`. Defaults to None.
+            typed: parse the results into the dtypes of the `dtype` column of
+                `fields_table` (nullable integers and floats, categoricals and
+                Arrow-backed strings) instead of object columns. Defaults to False.
         """
-        self._API_URL = api_url
-        self._POLLING_INTERVAL = pooling_interval
+        self._init_state(pooling_interval, api_url, cache, typed)
         self.retries = self._setup_retries(total_retries, backoff_factor)
         self.session = requests.Session()
         self._setup_session()
+        self.session.hooks["response"].append(self._record_release)
+
+    def _init_state(
+        self,
+        pooling_interval: int,
+        api_url: str,
+        cache: Optional[Union[MemoryCache, SQLiteCache]],
+        typed: bool,
+    ) -> None:
+        """Set the attributes that don't depend on the HTTP client, shared with the
+        asyncio clients of `UniProtMapper.async_api`."""
+        self._API_URL = api_url
+        self.cache = cache
+        self.typed = typed
+        self._POLLING_INTERVAL = pooling_interval
+        self.uniprot_release = None
         self._re_next_link = re.compile(r'<(.+)>; rel="next"')
         self._cached_supported_return_fields = None
+        self._cached_field_dtypes = None
 
     @property
     def supported_return_fields(self) -> list:
         """Return a list of the supported fields in UniProtKB & ID mapping API."""
         if self._cached_supported_return_fields is None:
-            full_version_fields = (
-                self.fields_table.query('has_full_version == "yes"')["returned_field"]
-                + "_full"
-            ).tolist()
-            self._cached_supported_return_fields = (
-                self.fields_table["returned_field"].tolist() + full_version_fields
+            self._cached_supported_return_fields = list(
+                get_registry().return_fields_order
             )
         return self._cached_supported_return_fields
 
+    @property
+    def field_dtypes(self) -> dict:
+        """Return a dictionary with the pandas dtype of each column label returned by
+        the API, as found in the `dtype` column of `fields_table`. The `From` and `To`
+        columns of the ID mapping results are strings."""
+        if self._cached_field_dtypes is None:
+            dtypes = {"From": "string", "To": "string"}
+            for label, dtype in get_registry().label_dtypes.items():
+                dtypes.setdefault(label, dtype)
+            self._cached_field_dtypes = {k: resolve_dtype(v) for k, v in dtypes.items()}
+        return self._cached_field_dtypes
+
+    def _validate_fields(self, fields):
+        """Return the requested return fields in lowercase, replacing `default` by
+        `self.default_fields`. Raises a ValueError if any of the fields isn't supported.
+        """
+        if fields is None:
+            return None
+        if fields == "default":
+            return self.default_fields
+        if isinstance(fields, str):
+            fields = [fields]
+        fields = [field.lower() for field in fields]
+        valid_fields = get_registry().return_fields
+        if not all(field in valid_fields for field in fields):
+            raise ValueError(
+                f"Invalid fields. Valid fields are: {self.supported_return_fields}"
+            )
+        return fields
+
     def _setup_retries(self, total_retries, backoff_factor) -> None:
         return Retry(
             total=total_retries,
@@ -82,8 +148,30 @@ class BaseUniProt(ABC):
             status_forcelist=[500, 502, 503, 504],
         )
 
-    def _setup_session(self) -> None:
-        self.session.mount("https://", HTTPAdapter(max_retries=self.retries))
+    def _setup_session(self, pool_maxsize: int = 10) -> None:
+        self._pool_maxsize = pool_maxsize
+        self.session.mount(
+            "https://",
+            HTTPAdapter(max_retries=self.retries, pool_maxsize=pool_maxsize),
+        )
+
+    def _record_release(self, response, *args, **kwargs) -> None:
+        """Response hook keeping track of the UniProt release of the results."""
+        release = response.headers.get("X-UniProt-Release")
+        if release is not None:
+            self.uniprot_release = release
+
+    def fetch_release(self) -> str:
+        """Return the current UniProt release, as reported by the API for an empty
+        search, updating `uniprot_release`. Unlike `uniprot_release`, which is None
+        until a request has been sent, e.g.: when all results came from the cache,
+        this always sends a request."""
+        response = self.session.get(
+            f"{self._API_URL}/uniprotkb/search",
+            params={"query": "*", "format": "tsv", "size": 0},
+        )
+        self.check_response(response)
+        return response.headers["X-UniProt-Release"]
 
     def check_response(self, response) -> None:
         try:
@@ -0,0 +1,118 @@
+"""Holds the detached handles of ID mapping jobs returned by `ProtMapper.submit`:
+
+- MappingJob: serializable handle of a submitted job, to be collected later with
+    `ProtMapper.fetch`, possibly from another process.
+- JobRegistry: local JSON registry of submitted jobs, keyed by a hash of the IDs and
+    databases, so that repeated submissions reuse the existing server-side job.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+
+
+@dataclass
+class MappingJob:
+    """Handle of an ID mapping job submitted to UniProt. Handles can be serialized
+    with `to_json` and restored with `MappingJob.from_json`.
+
+    Example:
+    >>> job = mapper.submit(ids, to_db="Ensembl")
+    >>> Path("job.json").write_text(job.to_json())
+    >>> # later, from another process
+    >>> job = MappingJob.from_json(Path("job.json").read_text())
+    >>> for page, failed in ProtMapper().fetch(job):
+    >>>     ...
+    """
+
+    job_id: str
+    from_db: str
+    to_db: str
+    ids: List[str]
+    submitted_at: float = field(default_factory=time.time)
+
+    @property
+    def key(self) -> str:
+        """Hash of the IDs and databases, identifying the job in a `JobRegistry`."""
+        return job_key(self.ids, self.from_db, self.to_db)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MappingJob":
+        return cls(**data)
+
+    @classmethod
+    def from_json(cls, data: str) -> "MappingJob":
+        return cls.from_dict(json.loads(data))
+
+
+def job_key(ids: List[str], from_db: str, to_db: str) -> str:
+    """Return the hash identifying a mapping of `ids` from `from_db` to `to_db`."""
+    content = "\n".join([from_db, to_db] + list(ids))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+class JobRegistry:
+    """Local registry of the submitted jobs, stored as a JSON file. Passed to
+    `ProtMapper(job_registry=...)`, it makes `submit` return the job previously
+    submitted for the same IDs and databases, as long as UniProt still holds it
+    (finished jobs are kept for about a week).
+
+    Example:
+    >>> mapper = ProtMapper(job_registry=JobRegistry("~/.cache/uniprot_jobs.json"))
+    >>> job = mapper.submit(ids, to_db="Ensembl")
+    >>> mapper.submit(ids, to_db="Ensembl").job_id == job.job_id
+    True
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        """Open (or create) the registry.
+
+        Args:
+            path: path to the JSON file holding the registry.
+        """
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, dict] = {}
+        if self.path.exists():
+            with self.path.open("r") as f:
+                self._jobs = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __iter__(self) -> Iterator[MappingJob]:
+        return iter([MappingJob.from_dict(job) for job in self._jobs.values()])
+
+    def get(self, key: str) -> Optional[MappingJob]:
+        """Return the job registered under `key`, if any."""
+        job = self._jobs.get(key)
+        return None if job is None else MappingJob.from_dict(job)
+
+    def add(self, job: MappingJob) -> None:
+        """Register `job`, replacing any job previously submitted for the same IDs."""
+        with self._lock:
+            self._jobs[job.key] = job.to_dict()
+            self._save()
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            if self._jobs.pop(key, None) is not None:
+                self._save()
+
+    def _save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with tmp_path.open("w") as f:
+            json.dump(self._jobs, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,135 @@
+"""Holds the bounded, threaded pipeline used to overlap the requests for pages of results
+with the download, decompression and parsing of their bodies. The pages of UniProt
+results are linked through the `Link` header, so the next page can be requested while
+the body of the current one is still being streamed and decoded, and throughput
+approaches that of the slowest stage instead of the sum of all of them.
+
+Example:
+>>> pages = pipeline(iter_page_responses(), read_page, parse, depth=2)
+>>> for page in pages:
+>>>     ...
+"""
+
+import queue
+import threading
+from typing import Callable, Iterable, Iterator
+
+_DONE = object()
+
+
+class _Failure:
+    """Wraps an exception raised in a worker thread, to re-raise it in the consumer."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def _close(item) -> None:
+    """Release an item that won't reach the consumer, e.g.: a streamed response."""
+    close = getattr(item, "close", None)
+    if callable(close):
+        close()
+
+
+def _drain(inbox: queue.Queue) -> None:
+    """Close the items left in a queue of a stopped pipeline."""
+    while True:
+        try:
+            _close(inbox.get_nowait())
+        except queue.Empty:
+            return
+
+
+def pipeline(source: Iterable, *stages: Callable, depth: int = 2) -> Iterator:
+    """Yield `stages[-1](...(stages[0](item)))` for each item of `source`, in order.
+    Iterating over `source` (e.g.: downloading pages) and each of the stages run on
+    their own worker thread, connected by queues of at most `depth` items.
+
+    If the consumer stops iterating, the workers stop once their current item is done.
+    Exceptions raised by `source` or a stage are re-raised in the consumer. Either way,
+    the items that won't reach the consumer, e.g.: streamed responses, are closed if
+    they have a `close` method, and so is `source`.
+
+    Args:
+        source: the items to process, e.g.: the raw bodies of the pages of results.
+        stages: functions applied to each item, one after another.
+        depth: maximum number of items waiting between two stages, i.e.: how many
+            pages are prefetched. If 0, the items are processed one at a time in the
+            calling thread. Defaults to 2.
+    """
+    if depth <= 0:
+        for item in source:
+            for stage in stages:
+                item = stage(item)
+            yield item
+        return
+
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=depth) for _ in range(len(stages) + 1)]
+
+    def put(outbox: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                outbox.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            if stop.is_set():  # the consumer may have drained `outbox` already
+                _drain(outbox)
+                return False
+            return True
+        _close(item)
+        return False
+
+    def produce() -> None:
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+        except Exception as e:  # re-raised by the consumer
+            put(queues[0], _Failure(e))
+            return
+        finally:
+            _close(source)
+        put(queues[0], _DONE)
+
+    def work(stage: Callable, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        while not stop.is_set():
+            try:
+                item = inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if stop.is_set():
+                _close(item)
+                return
+            last = item is _DONE or isinstance(item, _Failure)
+            if not last:
+                try:
+                    result = stage(item)
+                except Exception as e:  # re-raised by the consumer
+                    _close(item)
+                    result, last = _Failure(e), True
+                item = result
+            if not put(outbox, item) or last:
+                return
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    for i, stage in enumerate(stages):
+        threads.append(
+            threading.Thread(
+                target=work, args=(stage, queues[i], queues[i + 1]), daemon=True
+            )
+        )
+    for thread in threads:
+        thread.start()
+    try:
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for inbox in queues:
+            _drain(inbox)
@@ -0,0 +1,136 @@
+"""Holds the execution planner of `ProtKB.get` and `ProtKB.explain`: from the number of
+results of a query, it picks how to download them, and estimates the size of the
+download from the requested fields.
+
+The strategies, from the cheapest to the most parallel, are:
+- "single page": all results fit in the first page of the search endpoint;
+- "paginate": the pages of the search endpoint are walked one after another;
+- "stream": all results are downloaded in a single response of the stream endpoint;
+- "sharded": the query is split into disjoint shards downloaded concurrently, see
+  `UniProtMapper.sharding`.
+"""
+
+from dataclasses import dataclass
+from math import ceil
+from typing import Iterable, Optional, Tuple
+
+# Rough average size, in bytes, of the values of some return fields in a TSV row of
+# UniProtKB, used to estimate the size of a download. Other fields are estimated from
+# their dtype, see `DTYPE_BYTES`; cross references from `XREF_BYTES`.
+FIELD_BYTES = {
+    "accession": 7,
+    "id": 12,
+    "gene_names": 20,
+    "gene_primary": 8,
+    "protein_name": 60,
+    "organism_name": 40,
+    "lineage": 250,
+    "lineage_ids": 120,
+    "sequence": 360,
+    "keyword": 150,
+    "keywordid": 60,
+    "protein_families": 50,
+    "go": 600,
+    "go_p": 300,
+    "go_c": 120,
+    "go_f": 150,
+    "go_id": 150,
+    "cc_function": 400,
+    "cc_subcellular_location": 150,
+    "cc_catalytic_activity": 300,
+    "ft_domain": 100,
+    "ft_chain": 60,
+    "ft_variant": 300,
+    "ft_mod_res": 150,
+    "lit_pubmed_id": 80,
+    "structure_3d": 4,
+}
+DTYPE_BYTES = {"Int64": 6, "Float64": 8, "category": 10, "string": 30}
+XREF_BYTES = {"short": 20, "full": 60}
+
+
+@dataclass
+class QueryPlan:
+    """Estimated cost of a UniProtKB query, as returned by `ProtKB.explain`.
+
+    Attributes:
+        query: the query.
+        rows: number of results, as reported by the API.
+        pages: number of pages of the search endpoint holding the results.
+        bytes: estimated size of the (uncompressed) TSV results, in bytes.
+        strategy: how `ProtKB.get` downloads the results, one of "single page",
+            "paginate", "stream" or "sharded".
+        shards: maximum number of shards the query is split into; 1 unless the
+            strategy is "sharded".
+    """
+
+    query: str
+    rows: int
+    pages: int
+    bytes: int
+    strategy: str
+    shards: int = 1
+
+
+def estimate_row_bytes(fields: Iterable[str], dtypes: Optional[dict] = None) -> int:
+    """Estimate the size, in bytes, of a TSV row with `fields`.
+
+    Args:
+        fields: the return fields of the query.
+        dtypes: dtype of each return field, as in the `dtype` column of the fields
+            table. Fields missing from `FIELD_BYTES` are estimated from it. Defaults
+            to None.
+    """
+    dtypes = dtypes or {}
+    n_bytes = 0
+    for field in fields:
+        if field in FIELD_BYTES:
+            n_bytes += FIELD_BYTES[field]
+        elif field.startswith("xref_"):
+            n_bytes += XREF_BYTES["full" if field.endswith("_full") else "short"]
+        else:
+            n_bytes += DTYPE_BYTES.get(dtypes.get(field), DTYPE_BYTES["string"])
+        n_bytes += 1  # separator
+    return n_bytes
+
+
+def choose_strategy(
+    rows: int,
+    size: int,
+    mode: str = "auto",
+    shards: Optional[int] = None,
+    stream_limit: int = 10_000_000,
+    shard_rows: int = 100_000,
+    max_shards: int = 8,
+) -> Tuple[str, int]:
+    """Pick the strategy to download `rows` results, as described in the module
+    docstring.
+
+    Args:
+        rows: number of results of the query.
+        size: number of results per page of the search endpoint.
+        mode: "auto", "stream" or "paginate", see `ProtKB.get`. Defaults to "auto".
+        shards: number of shards requested. If None, queries with more than
+            `shard_rows` results are sharded, with a shard per `shard_rows` results
+            up to `max_shards`. Defaults to None.
+        stream_limit: maximum number of results served by the stream endpoint.
+            Defaults to 10_000_000.
+        shard_rows: see `shards`. Defaults to 100_000.
+        max_shards: see `shards`. Defaults to 8.
+
+    Returns:
+        Tuple[str, int]: the strategy and the maximum number of shards.
+    """
+    if shards is not None and shards > 1:
+        return "sharded", shards
+    if mode == "stream":
+        return "stream", 1
+    if rows <= size:
+        return "single page", 1
+    if mode == "paginate":
+        return "paginate", 1
+    if shards is None and rows > shard_rows:
+        return "sharded", min(max_shards, ceil(rows / shard_rows))
+    if rows > stream_limit:
+        return "paginate", 1
+    return "stream", 1
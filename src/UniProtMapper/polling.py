@@ -0,0 +1,151 @@
+"""Holds JobPoller: a scheduler polling the status of several ID mapping jobs from a
+single loop, with exponential backoff and jitter between the checks of each job."""
+
+import heapq
+import random
+import statistics
+import time
+from logging import info
+from typing import Dict, Iterator, List, Tuple, Union
+
+import requests
+
+
+class JobPoller:
+    """Poll the status of ID mapping jobs until they're finished. Each job is first
+    checked after `initial_interval` seconds and the interval is multiplied by
+    `backoff` after each unfinished check, up to `max_interval`. A `Retry-After` header
+    sent by the API takes precedence over the computed interval.
+
+    Example:
+    >>> poller = JobPoller(mapper.session, "https://rest.uniprot.org")
+    >>> for job_id in job_ids:
+    >>>     poller.add(job_id)
+    >>> for job_id, outcome in poller.poll():
+    >>>     ...  # outcome is the final status response, or the exception raised
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        api_url: str,
+        initial_interval: float = 0.25,
+        max_interval: float = 3,
+        backoff: float = 2.0,
+        jitter: float = 0.1,
+    ) -> None:
+        """Initialize the poller.
+
+        Args:
+            session: the session used to check the status of the jobs.
+            api_url: The url for the REST API.
+            initial_interval: seconds to wait before the first status check. Defaults
+                to 0.25.
+            max_interval: maximum number of seconds between two checks of the same
+                job. Defaults to 3.
+            backoff: factor multiplying the interval after each check. Defaults to 2.
+            jitter: relative random variation applied to each interval, so that
+                jobs submitted together aren't checked in bursts. Defaults to 0.1.
+        """
+        self.session = session
+        self._API_URL = api_url
+        self.initial_interval = initial_interval
+        self.max_interval = max(max_interval, initial_interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self._queue: List[Tuple[float, str]] = []
+        self._intervals: Dict[str, float] = {}
+        self._added_at: Dict[str, float] = {}
+        self.time_to_ready: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def add(self, job_id: str) -> None:
+        """Start tracking a submitted job."""
+        now = time.monotonic()
+        self._added_at[job_id] = now
+        self._intervals[job_id] = self.initial_interval
+        heapq.heappush(
+            self._queue, (now + self._jittered(self.initial_interval), job_id)
+        )
+
+    def _jittered(self, interval: float) -> float:
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _reschedule(self, job_id: str, retry_after: Union[str, None]) -> None:
+        interval = self._intervals[job_id]
+        delay = self._jittered(interval)
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        self._intervals[job_id] = min(interval * self.backoff, self.max_interval)
+        heapq.heappush(self._queue, (time.monotonic() + delay, job_id))
+
+    def check_status(self, job_id: str) -> requests.Response:
+        """Send a single status request for `job_id`. The redirect sent by the API
+        once the job is finished isn't followed, so no results are downloaded."""
+        return self.session.get(
+            f"{self._API_URL}/idmapping/status/{job_id}", allow_redirects=False
+        )
+
+    def next_due(self) -> Union[float, None]:
+        """Return the number of seconds until the next status check is due, or None
+        if no job is tracked."""
+        if not self._queue:
+            return None
+        return max(0.0, self._queue[0][0] - time.monotonic())
+
+    def poll(self) -> Iterator[Tuple[str, Union[requests.Response, Exception]]]:
+        """Check the tracked jobs until all of them are finished, yielding them in the
+        order they finish. For each job, yields a tuple with the job ID and either the
+        final status response (usually a redirect to the results) or the exception
+        raised for that job. An
+        error in one of the jobs doesn't interrupt the polling of the others."""
+        while self._queue:
+            wait = self.next_due()
+            if wait > 0:
+                time.sleep(wait)
+            yield from self.poll_due()
+
+    def poll_due(self) -> Iterator[Tuple[str, Union[requests.Response, Exception]]]:
+        """Same as `poll`, but only the jobs whose check is already due are checked,
+        without waiting for the others. Jobs can be added between two calls."""
+        while self._queue and self._queue[0][0] <= time.monotonic():
+            _, job_id = heapq.heappop(self._queue)
+            try:
+                response = self.check_status(job_id)
+                if response.status_code == 429:
+                    self._reschedule(job_id, response.headers.get("Retry-After"))
+                    continue
+                response.raise_for_status()
+                if response.is_redirect:  # finished, redirecting to the results
+                    status = None
+                else:
+                    status = response.json().get("jobStatus")
+                if status in ["RUNNING", "NEW"]:
+                    info(f"Job {job_id} is {status}, retrying...")
+                    self._reschedule(job_id, response.headers.get("Retry-After"))
+                    continue
+                if status not in [None, "FINISHED"]:
+                    raise Exception(status)
+                outcome = response
+                self.time_to_ready.append(time.monotonic() - self._added_at[job_id])
+            except Exception as e:
+                outcome = e
+            del self._intervals[job_id], self._added_at[job_id]
+            yield job_id, outcome
+
+
+def summarize_durations(durations: List[float]) -> dict:
+    """Return the count, mean, median, 90th percentile and max of a list of durations
+    in seconds. Used to report the time-to-ready distribution of the polled jobs."""
+    if not durations:
+        return {"n": 0}
+    ordered = sorted(durations)
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "median": statistics.median(ordered),
+        "p90": ordered[min(len(ordered) - 1, int(0.9 * len(ordered)))],
+        "max": ordered[-1],
+    }
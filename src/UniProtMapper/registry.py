@@ -0,0 +1,81 @@
+"""Holds the registry of the return fields and mapping databases supported by UniProt,
+built once from the package resources on first use. All lookups are done on frozensets
+and read-only dictionaries, so validating a request takes constant time and no file is
+read in the request path.
+
+Example:
+>>> from UniProtMapper.registry import get_registry
+>>> registry = get_registry()
+>>> "go_id" in registry.return_fields, "PDB" in registry.mapping_dbs
+(True, True)
+"""
+
+import csv
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import FrozenSet, Mapping, Tuple
+
+from .utils import get_resource_file
+
+
+@dataclass(frozen=True)
+class Registry:
+    """Immutable view of the fields table and of the mapping databases.
+
+    Attributes:
+        return_fields: valid return fields, including the `_full` versions.
+        return_fields_order: the same fields, in the order of the fields table.
+        field_labels: column label of each return field.
+        label_dtypes: dtype of each column label, from the `dtype` column of the
+            fields table.
+        xref_databases: databases accepted by `XRefCountField`, without `xref_`.
+        xref_databases_order: the same databases, in the order of the fields table.
+        mapping_dbs: databases supported by the ID mapping API.
+        mapping_dbs_order: the same databases, sorted.
+    """
+
+    return_fields: FrozenSet[str]
+    return_fields_order: Tuple[str, ...]
+    field_labels: Mapping[str, str]
+    label_dtypes: Mapping[str, str]
+    xref_databases: FrozenSet[str]
+    xref_databases_order: Tuple[str, ...]
+    mapping_dbs: FrozenSet[str]
+    mapping_dbs_order: Tuple[str, ...]
+
+
+@lru_cache(maxsize=None)
+def get_registry() -> Registry:
+    """Build the registry from `uniprot_return_fields.csv` and
+    `uniprot_mapping_dbs.json`. The files are only read on the first call."""
+    csv_path = get_resource_file("resources/uniprot_return_fields.csv")
+    with open(csv_path, "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+    fields = [row["returned_field"] for row in rows]
+    full_fields = [
+        row["returned_field"] + "_full"
+        for row in rows
+        if row["has_full_version"] == "yes"
+    ]
+    labels, dtypes = {}, {}
+    for row in rows:
+        labels.setdefault(row["returned_field"], row["label"])
+        dtypes.setdefault(row["label"], row["dtype"])
+    xrefs = tuple(f.replace("xref_", "", 1) for f in fields if f.startswith("xref_"))
+
+    with open(get_resource_file("resources/uniprot_mapping_dbs.json"), "r") as f:
+        dbs_dict = json.load(f)
+    dbs = tuple(sorted(db for group in dbs_dict.values() for db in group))
+
+    return Registry(
+        return_fields=frozenset(fields + full_fields),
+        return_fields_order=tuple(fields + full_fields),
+        field_labels=MappingProxyType(labels),
+        label_dtypes=MappingProxyType(dtypes),
+        xref_databases=frozenset(xrefs),
+        xref_databases_order=xrefs,
+        mapping_dbs=frozenset(dbs),
+        mapping_dbs_order=dbs,
+    )
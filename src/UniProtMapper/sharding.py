@@ -0,0 +1,112 @@
+"""Holds the planner used by `ProtKB.get` to split a UniProtKB query into disjoint
+shards that can be downloaded concurrently. UniProtKB paginates search results with a
+cursor, so the pages of a single query can only be fetched one after another; the
+shards restrict the query to disjoint ranges of a numeric field (e.g.: `length`) and
+are sized from the number of results reported by the API.
+
+Example:
+>>> from UniProtMapper.sharding import plan_shards
+>>> shards = plan_shards("organism_id:9606", protkb.count, n_shards=8)
+>>> [shard.query for shard in shards][:2]
+['(organism_id:9606) AND length:[0 TO 499]', '(organism_id:9606) AND length:[500 TO 999]']
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+# numeric fields that can be used to shard a query -> value at which the open-ended
+# range `[0 TO *]` is first split
+SHARD_FIELDS = {"length": 1000, "mass": 100000}
+
+
+@dataclass
+class Shard:
+    """A sub-query restricting a query to `lower <= field <= upper`. An `upper` of
+    None stands for `*`, i.e.: no upper bound."""
+
+    query: str
+    count: int
+    lower: int
+    upper: Optional[int]
+
+
+def shard_query(query: str, field: str, lower: int, upper: Optional[int]) -> str:
+    """Return `query` restricted to the range `[lower TO upper]` of `field`."""
+    return f"({query}) AND {field}:[{lower} TO {'*' if upper is None else upper}]"
+
+
+def split_range(
+    field: str, lower: int, upper: Optional[int]
+) -> Optional[Tuple[Tuple[int, Optional[int]], Tuple[int, Optional[int]]]]:
+    """Split the range `[lower TO upper]` in two disjoint ranges covering it, or
+    return None if it holds a single value. Open-ended ranges are split at
+    `SHARD_FIELDS[field]` and then at twice their lower bound."""
+    if upper is None:
+        middle = max(SHARD_FIELDS[field], 2 * lower)
+        return (lower, middle - 1), (middle, None)
+    if lower >= upper:
+        return None
+    middle = (lower + upper) // 2
+    return (lower, middle), (middle + 1, upper)
+
+
+def plan_shards(
+    query: str,
+    count: Callable[[str], int],
+    n_shards: int,
+    field: str = "length",
+    min_count: int = 500,
+    total: Optional[int] = None,
+) -> List[Shard]:
+    """Split `query` into at most `n_shards` disjoint shards of similar size. The
+    largest shard is bisected on `field` until there are `n_shards` shards or the
+    largest one holds no more than `min_count` results; only one of the halves is
+    counted, the size of the other one is deduced from it.
+
+    Args:
+        query: the UniProtKB query to be split.
+        count: function returning the number of results of a query, e.g.:
+            `ProtKB.count`. It is called once per bisection, about `n_shards`
+            times unless many ranges turn out to be empty.
+        n_shards: maximum number of shards.
+        field: numeric field used to split the query. One of `SHARD_FIELDS`.
+            Defaults to "length".
+        min_count: shards with this number of results or fewer aren't split further,
+            e.g.: the page size. Defaults to 500.
+        total: number of results of `query`, if already known, saving a call to
+            `count`. Defaults to None.
+
+    Raises:
+        ValueError: If `field` can't be used to shard queries.
+
+    Returns:
+        List[Shard]: the non-empty shards, sorted by range. Ranges without results
+        are left out.
+    """
+    if field not in SHARD_FIELDS:
+        raise ValueError(
+            f"Can't shard on {field}. Supported fields are {list(SHARD_FIELDS)}"
+        )
+    if total is None:
+        total = count(query)
+    shards, done = [Shard(shard_query(query, field, 0, None), total, 0, None)], []
+    while shards and len(shards) + len(done) < n_shards:
+        largest = max(shards, key=lambda shard: shard.count)
+        if largest.count <= min_count:
+            break
+        shards.remove(largest)
+        halves = split_range(field, largest.lower, largest.upper)
+        if halves is None:
+            done.append(largest)
+            continue
+        (lower, upper), (next_lower, next_upper) = halves
+        count_lower = count(shard_query(query, field, lower, upper))
+        for bounds, n_results in [
+            ((lower, upper), count_lower),
+            ((next_lower, next_upper), largest.count - count_lower),
+        ]:
+            if n_results > 0:  # empty ranges are dropped, not counted as shards
+                query_range = shard_query(query, field, *bounds)
+                shards.append(Shard(query_range, n_results, *bounds))
+    shards = sorted(shards + done, key=lambda shard: shard.lower)
+    return [shard for shard in shards if shard.count > 0]
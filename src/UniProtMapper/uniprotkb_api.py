@@ -1,21 +1,52 @@
 """Hold the class to interact with the UniProtKB API. For query construction, use the
 field classes found in `UniProtMapper.uniprotkb_fields`."""
 
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
 from logging import info
-from typing import Generator, List, Optional, Tuple, Union
+from math import ceil
+from typing import Generator, Iterator, List, Optional, Tuple, Union
 
-import numpy as np
 import pandas as pd
 import requests
 from tqdm import tqdm
 
-from UniProtMapper.utils import decode_results
+from UniProtMapper.utils import (
+    ChunkReader,
+    append_tsv_page,
+    concat_frames,
+    iter_chunks,
+)
 
+from .arrow import ArrowSink, page_bytes, parse_tsv_page
+from .cache import make_cache_key
 from .field_base_classes import QueryBuilder
 from .interface import BaseUniProt
+from .pipeline import pipeline
+from .planner import QueryPlan, choose_strategy, estimate_row_bytes
+from .registry import get_registry
+from .sharding import plan_shards
 
 
 class ProtKB(BaseUniProt):
+    """Class for querying UniProtKB. Queries with more results than a page are, by
+    default, downloaded in a single request to the stream endpoint, as long as they
+    have no more than `stream_limit` results, the maximum served by the API. Queries
+    with more than `shard_rows` results are split into up to `max_shards` shards
+    downloaded concurrently. See `explain` and `UniProtMapper.planner`.
+
+    Pages are requested up to `prefetch` pages ahead of the download, decompression
+    and parsing of their bodies, see `UniProtMapper.pipeline`. Set it to 0 to process
+    them one at a time.
+    """
+
+    stream_limit = 10_000_000
+    shard_rows = 100_000
+    max_shards = 8
+    prefetch = 2
 
     def __init__(
         self,
@@ -23,6 +54,8 @@ class ProtKB(BaseUniProt):
         total_retries=5,
         backoff_factor=0.25,
         api_url="https://rest.uniprot.org",
+        cache=None,
+        typed=False,
     ) -> None:
         """Initialize the class. This will set up the session and retry mechanism.
 
@@ -32,12 +65,20 @@ class ProtKB(BaseUniProt):
             total_retries: The total number of retries to attempt. Defaults to 5.
             backoff_factor: The backoff factor to use when retrying. Defaults to 0.25.
             api_url: The url for the REST API. Defaults to "https://rest.uniprot.org".
+            cache: cache for the results of `get`, keyed on the query, fields and
+                `include_isoform`, e.g.: a `UniProtMapper.cache.MemoryCache`. Defaults
+                to None.
+            typed: parse the results into the dtypes of `field_dtypes` (nullable
+                integers and floats, categoricals and Arrow-backed strings) while
+                reading them, instead of letting pandas infer them. Defaults to False.
         """
         super().__init__(
             pooling_interval,
             total_retries,
             backoff_factor,
             api_url,
+            cache,
+            typed,
         )
         self.default_fields = (
             "accession",
@@ -62,6 +103,7 @@ class ProtKB(BaseUniProt):
         include_isoform: bool = False,
         compressed: bool = False,
         size: int = 500,
+        endpoint: str = "search",
     ) -> str:
         """Build the search URL with the given parameters.
 
@@ -72,6 +114,8 @@ class ProtKB(BaseUniProt):
             include_isoform: Whether to include isoforms
             compressed: Whether to request compressed response
             size: Batch size for pagination
+            endpoint: "search" for paginated results or "stream" for all results in
+                a single response, in which case `size` is ignored
 
         Returns:
             Complete URL for the API request
@@ -85,8 +129,10 @@ class ProtKB(BaseUniProt):
             "size": size,
         }
 
+        if endpoint == "stream":
+            params.pop("size")
         param_string = "&".join(f"{k}={v}" for k, v in params.items())
-        return f"{self._API_URL}/uniprotkb/search?{param_string}"
+        return f"{self._API_URL}/uniprotkb/{endpoint}?{param_string}"
 
     def submit_query(
         self,
@@ -133,8 +179,361 @@ class ProtKB(BaseUniProt):
             if not next_link:
                 break
 
-            response = self.session.get(next_link)
+            response = self.session.get(next_link, stream=True)
+            self.check_response(response)
+
+    def _cache_key(
+        self,
+        query: str,
+        fields: List[str],
+        include_isoform: bool,
+        limit: Optional[int] = None,
+    ) -> str:
+        """Return the key of the results of a query in `self.cache`."""
+        key_parts = [
+            "uniprotkb",
+            query,
+            ",".join(fields),
+            str(include_isoform),
+            "typed" if self.typed else None,
+        ]
+        if limit is not None:
+            key_parts.append(f"limit={limit}")
+        return make_cache_key(*key_parts)
+
+    def _csv_engine(self) -> str:
+        """Return the `pd.read_csv` engine for the results of `get`. Typed results are
+        parsed by pyarrow's multithreaded, columnar reader if it is installed; untyped
+        ones keep the C engine, whose type inference they rely on."""
+        if self.typed:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                return "c"
+            return "pyarrow"
+        return "c"
+
+    def count(
+        self, query: Union[QueryBuilder, str], include_isoform: bool = False
+    ) -> int:
+        """Return the number of results of `query`, read from the `x-total-results`
+        header of a search request for zero entries.
+
+        Args:
+            query: Query string or QueryBuilder object (UniProtMapper.uniprot_kb_fields).
+            include_isoform: Whether to include isoforms. Defaults to False
+        """
+        url = self._build_search_url(
+            query=str(query),
+            fields=["accession"],
+            include_isoform=include_isoform,
+            size=0,
+        )
+        response = self.session.get(url)
+        self.check_response(response)
+        return int(response.headers.get("x-total-results", 0))
+
+    def _choose_strategy(
+        self, rows: int, size: int, mode: str, shards: Optional[int]
+    ) -> Tuple[str, int]:
+        return choose_strategy(
+            rows,
+            size,
+            mode=mode,
+            shards=shards,
+            stream_limit=self.stream_limit,
+            shard_rows=self.shard_rows,
+            max_shards=self.max_shards,
+        )
+
+    def explain(
+        self,
+        query: Union[QueryBuilder, str],
+        fields: Optional[Union[str, List]] = None,
+        include_isoform: bool = False,
+        size: int = 500,
+        shards: Optional[int] = None,
+        mode: str = "auto",
+    ) -> QueryPlan:
+        """Estimate the cost of `get` for a query, without downloading its results:
+        the number of results is requested with `count`, and the size of the download
+        estimated from per-field averages (see `UniProtMapper.planner`).
+
+        Args:
+            query: Query string or QueryBuilder object (UniProtMapper.uniprot_kb_fields).
+            fields: list of UniProt return fields to be retrieved. See `get`.
+                Defaults to None.
+            include_isoform: Whether to include isoforms. Defaults to False
+            size: Batch size for pagination. Defaults to 500
+            shards: see `get`. Defaults to None.
+            mode: see `get`. Defaults to "auto".
+
+        Returns:
+            QueryPlan: the number of results, pages and (uncompressed) bytes, and the
+            strategy `get` would use to download them.
+
+        Example:
+        >>> protkb.explain(reviewed(True) & organism_id("9606"), fields="default")
+        QueryPlan(query='reviewed:true AND organism_id:9606', rows=20435, pages=41,
+                  bytes=28343345, strategy='stream', shards=1)
+        """
+        fields = self._validate_fields(fields) or list(self.default_fields)
+        query = str(query)
+        rows = self.count(query, include_isoform=include_isoform)
+        strategy, n_shards = self._choose_strategy(rows, size, mode, shards)
+        registry = get_registry()
+        dtypes = {
+            field: registry.label_dtypes.get(registry.field_labels.get(field))
+            for field in fields
+        }
+        return QueryPlan(
+            query=query,
+            rows=rows,
+            pages=max(1, ceil(rows / size)),
+            bytes=rows * estimate_row_bytes(fields, dtypes),
+            strategy=strategy,
+            shards=n_shards,
+        )
+
+    def _fetch(
+        self,
+        query: str,
+        fields: List[str],
+        include_isoform: bool,
+        compressed: bool,
+        size: int,
+        mode: str = "auto",
+        shards: Optional[int] = None,
+        shard_by: str = "length",
+        progress: bool = True,
+    ) -> Tuple[pd.DataFrame, str]:
+        """Download the results of `query` into a data frame, typed if `self.typed`. Unless
+        the strategy is already known, i.e.: when streaming or sharding were requested,
+        the first page of the search endpoint is requested and its `x-total-results`
+        header is used to choose the strategy (see `UniProtMapper.planner`). Queries
+        fitting in a single page are thus downloaded in a single round trip.
+
+        Returns:
+            Tuple[pd.DataFrame, str]: the results and the strategy used.
+        """
+        url_params = dict(
+            query=query,
+            fields=fields,
+            include_isoform=include_isoform,
+            compressed=compressed,
+            size=size,
+        )
+        response, rows = None, None
+        if mode == "stream" or shards is not None and shards > 1:
+            strategy, n_shards = self._choose_strategy(0, size, mode, shards)
+        else:
+            response = self.session.get(
+                self._build_search_url(**url_params), stream=True
+            )
+            self.check_response(response)
+            rows = int(response.headers.get("x-total-results", 0))
+            strategy, n_shards = self._choose_strategy(rows, size, mode, shards)
+            info(f"Downloading {rows} results, strategy: {strategy}")
+            if strategy in ["single page", "paginate"]:
+                return self._fetch_pages(response, compressed, size, progress), strategy
+            response.close()  # only its headers were downloaded
+
+        if strategy == "sharded":
+            count = partial(self.count, include_isoform=include_isoform)
+            plan = plan_shards(
+                query, count, n_shards, field=shard_by, min_count=size, total=rows
+            )
+            if len(plan) > 1:
+                queries = [shard.query for shard in plan]
+                fetch_args = (fields, include_isoform, compressed, size, mode)
+                return self._fetch_shards(queries, *fetch_args), strategy
+            return self._fetch(
+                query,
+                fields,
+                include_isoform,
+                compressed,
+                size,
+                mode=mode,
+                shards=1,
+                progress=progress,
+            )
+        url = self._build_search_url(**url_params, endpoint="stream")
+        return self._fetch_stream(url, compressed, progress), strategy
+
+    def _iter_page_responses(
+        self, response, max_pages: Optional[int] = None
+    ) -> Iterator[requests.Response]:
+        """Yield the streamed response of each page of a search, from its first
+        `response`, stopping after `max_pages` pages if given. Used as the first stage
+        of a `pipeline`, so that the next page is requested while the body of the
+        current one is downloaded, decompressed and parsed."""
+        for batch_response, _ in islice(self._get_batches(response), max_pages):
+            yield batch_response
+
+    @staticmethod
+    def _read_page(response, compressed: bool) -> List[bytes]:
+        """Download the streamed body of a page, returning it as the decompressed
+        chunks yielded by `iter_chunks`."""
+        with response:
+            return list(iter_chunks(response, compressed=compressed))
+
+    def _fetch_pages(
+        self, response, compressed: bool, size: int, progress: bool = True
+    ) -> pd.DataFrame:
+        """Walk the pages of a search one after another, from its first `response`.
+        The pages are requested up to `self.prefetch` pages ahead of the one being
+        downloaded and decompressed, and appended to a single buffer as they arrive,
+        to be parsed at once."""
+        results = io.BytesIO()
+        n_fetched = 0
+        total_results = int(response.headers.get("x-total-results", 0))
+
+        pages = pipeline(
+            self._iter_page_responses(response),
+            partial(self._read_page, compressed=compressed),
+            depth=self.prefetch,
+        )
+        pbar = tqdm(
+            pages,
+            desc="Fetching data",
+            total=total_results // size + 1,
+            disable=not progress,
+        )
+
+        for chunks in pbar:
+            n_fetched += append_tsv_page(
+                results, chunks, keep_header=results.tell() == 0
+            )
+            pbar.set_postfix({"fetched": f"{n_fetched}/{total_results}"})
+        return self._read_tsv(results)
+
+    def _fetch_stream(
+        self, url: str, compressed: bool, progress: bool = True, rows: int = 5000
+    ) -> pd.DataFrame:
+        """Download all results from the stream endpoint in a single response. The
+        body is decompressed chunk by chunk and parsed into data frames of `rows`
+        rows as it arrives, so that only the parsed results and about a chunk of TSV
+        are held in memory, regardless of the size of the download."""
+        pbar = tqdm(
+            desc="Streaming data", unit="B", unit_scale=True, disable=not progress
+        )
+
+        def _chunks(response):
+            for chunk in iter_chunks(response, compressed=compressed):
+                pbar.update(len(chunk))
+                yield chunk
+
+        with self.session.get(url, stream=True) as response:
             self.check_response(response)
+            reader = pd.read_csv(
+                ChunkReader(_chunks(response)),
+                sep="\t",
+                dtype=self.field_dtypes if self.typed else None,
+                chunksize=rows,
+            )
+            with reader:
+                df = concat_frames(list(reader))
+        pbar.close()
+        return df
+
+    def _fetch_shards(
+        self,
+        queries: List[str],
+        fields: List[str],
+        include_isoform: bool,
+        compressed: bool,
+        size: int,
+        mode: str,
+    ) -> pd.DataFrame:
+        """Download the `queries` of the shards of a query concurrently with `_fetch`,
+        and concatenate their results in order. The connection pool is grown to fit
+        the streamed pages each shard keeps open: the `self.prefetch` queued ones, the
+        one being requested and the one being read."""
+        pool_maxsize = len(queries) * (max(self.prefetch, 0) + 2)
+        if pool_maxsize > self._pool_maxsize:
+            self._setup_session(pool_maxsize=pool_maxsize)
+        fetch_args = (fields, include_isoform, compressed, size, mode)
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            futures = [
+                executor.submit(self._fetch, query, *fetch_args, 1, progress=False)
+                for query in queries
+            ]
+            shards = [
+                future.result()[0] for future in tqdm(futures, desc="Fetching shards")
+            ]
+        return concat_frames(shards)
+
+    def _read_tsv(self, buffer: io.BytesIO) -> pd.DataFrame:
+        """Parse a buffer of TSV results into a data frame, typed if `self.typed`."""
+        buffer.seek(0)
+        return pd.read_csv(
+            buffer,
+            sep="\t",
+            dtype=self.field_dtypes if self.typed else None,
+            engine=self._csv_engine(),
+        )
+
+    def iter_pages(
+        self,
+        query: Union[QueryBuilder, str],
+        fields: Optional[Union[str, List]] = None,
+        include_isoform: bool = False,
+        compressed: bool = False,
+        size: int = 500,
+        limit: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Yield the results of a query page by page, as they arrive. Pages are
+        downloaded, decompressed and parsed in a `pipeline`, at most `self.prefetch`
+        pages ahead of the consumer, so breaking out of the loop stops the download.
+
+        Args:
+            query: Query string or QueryBuilder object (UniProtMapper.uniprot_kb_fields).
+            fields: list of UniProt return fields to be retrieved. See `get`.
+                Defaults to None.
+            include_isoform: Whether to include isoforms. Defaults to False
+            compressed: Whether to request compressed response. Defaults to False
+            size: Batch size for pagination. Defaults to 500
+            limit: maximum number of results. Only the pages holding the first
+                `limit` results are requested, and pages are no larger than `limit`.
+                Defaults to None.
+
+        Yields:
+            pd.DataFrame: a page of results, typed if `self.typed`. A query without
+            results yields a single empty page.
+
+        Example:
+        >>> for page in protkb.iter_pages(reviewed(True), fields=["accession"], limit=10):
+        >>>     print(page["Entry"].tolist())
+        """
+        fields = self._validate_fields(fields)
+        if fields is None:
+            fields = list(self.default_fields)
+        if limit is not None:
+            size = max(1, min(size, limit))
+        url = self._build_search_url(
+            query=(str(query) if isinstance(query, QueryBuilder) else query),
+            fields=fields,
+            include_isoform=include_isoform,
+            compressed=compressed,
+            size=size,
+        )
+        response = self.session.get(url, stream=True)
+        self.check_response(response)
+        pages = pipeline(
+            self._iter_page_responses(
+                response, max_pages=None if limit is None else ceil(limit / size)
+            ),
+            partial(self._read_page, compressed=compressed),
+            lambda chunks: self._read_tsv(io.BytesIO(b"".join(chunks))),
+            depth=self.prefetch,
+        )
+        n_yielded = 0
+        for df in pages:
+            if limit is not None and n_yielded + len(df) >= limit:
+                yield df.iloc[: limit - n_yielded]
+                return
+            n_yielded += len(df)
+            yield df
 
     def get(
         self,
@@ -143,6 +542,10 @@ class ProtKB(BaseUniProt):
         include_isoform: bool = False,
         compressed: bool = False,
         size: int = 500,
+        shards: Optional[int] = None,
+        shard_by: str = "length",
+        mode: str = "auto",
+        limit: Optional[int] = None,
     ) -> pd.DataFrame:
         """Main method to retrieve data from UniProtKB. For the query, use the supported fields
         found within `UniProtMapper.uniprot_kb_fields`.
@@ -158,26 +561,107 @@ class ProtKB(BaseUniProt):
             include_isoform: Whether to include isoforms. Defaults to False
             compressed: Whether to request compressed response. Defaults to False
             size: Batch size for pagination. Defaults to 500
+            shards: maximum number of disjoint sub-queries the query is split into,
+                to download them concurrently. UniProtKB paginates results with a
+                cursor, so the pages of a single query can only be fetched one after
+                another. The shards are planned from the number of results of the
+                query, see `UniProtMapper.sharding.plan_shards`. If None, queries with
+                more than `self.shard_rows` results are split into a shard per
+                `self.shard_rows` results, up to `self.max_shards`; 1 disables
+                sharding. Defaults to None.
+            shard_by: numeric field used to split the query, "length" or "mass".
+                Defaults to "length".
+            mode: how results are downloaded. "paginate" walks the pages of the search
+                endpoint, one request per `size` results; "stream" downloads them in a
+                single response from the stream endpoint, decompressed and parsed as it
+                arrives. "auto" streams the results if the query has more of them
+                than a page and no more than `self.stream_limit`, as reported by the
+                first page. Queries with a single page of results take a single
+                request. Shards pick their own mode. Use `explain` to preview the chosen strategy.
+                Defaults to "auto".
+            limit: maximum number of results. If set, the first `limit` results are
+                collected page by page with `iter_pages`, ignoring `shards` and
+                `mode`. Defaults to None.
+
+        Raises:
+            ValueError: If `mode` is not one of "auto", "stream" or "paginate".
 
         Returns:
             - DataFrame with the retrieved data
         """
-        if fields is not None:
-            if fields == "default":
-                fields = self.default_fields
-            else:
-                fields = np.char.lower(np.array(fields))
-                if not np.isin(fields, self.supported_return_fields).all():
-                    raise ValueError(
-                        "Invalid fields. Valid fields are: "
-                        f"{self.supported_return_fields}"
-                    )
+        if mode not in ["auto", "stream", "paginate"]:
+            raise ValueError(
+                f'Invalid mode {mode}. Valid modes are "auto", "stream" and "paginate"'
+            )
+        fields = self._validate_fields(fields)
         if fields is None:
             info(
                 f"No fields provided. Using default fields: {', '.join(self.default_fields)}"
             )
             fields = list(self.default_fields)
 
+        query = str(query) if isinstance(query, QueryBuilder) else query
+        if self.cache is not None:
+            key = self._cache_key(query, fields, include_isoform, limit)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached.copy()
+
+        if limit is not None:
+            pages = self.iter_pages(
+                query, fields, include_isoform, compressed, size, limit=limit
+            )
+            df = concat_frames(list(pages))
+            if self.cache is not None:
+                self.cache.set(key, df.copy(), release=self.uniprot_release)
+            return df
+
+        df, strategy = self._fetch(
+            query,
+            fields,
+            include_isoform,
+            compressed,
+            size,
+            mode=mode,
+            shards=shards,
+            shard_by=shard_by,
+        )
+        if strategy == "sharded" and "Entry" in df.columns:
+            # entries updated while downloading could be returned by two shards
+            df = df.drop_duplicates("Entry", ignore_index=True)
+        if self.cache is not None:
+            self.cache.set(key, df.copy(), release=self.uniprot_release)
+        return df
+
+    def get_arrow(
+        self,
+        query: Union[QueryBuilder, str],
+        fields: Optional[Union[str, List]] = None,
+        include_isoform: bool = False,
+        compressed: bool = False,
+        size: int = 500,
+        output: Optional[Union[str, os.PathLike]] = None,
+    ):
+        """Arrow-native version of `get`: the TSV pages are parsed straight into
+        `pyarrow` tables, skipping pandas altogether. Requires `pyarrow`.
+
+        Args:
+            query: Query string or QueryBuilder object (UniProtMapper.uniprot_kb_fields).
+            fields: list of UniProt return fields to be retrieved. See `get`.
+                Defaults to None.
+            include_isoform: Whether to include isoforms. Defaults to False
+            compressed: Whether to request compressed response. Defaults to False
+            size: Batch size for pagination. Defaults to 500
+            output: path to a Parquet file. If given, each page is appended to the
+                file as it arrives instead of being kept in memory. Defaults to None.
+
+        Returns:
+            Union[pyarrow.Table, Path]: the retrieved data, or the path to `output`.
+            All columns are strings, unless the client is `typed`.
+        """
+        fields = self._validate_fields(fields)
+        if fields is None:
+            fields = list(self.default_fields)
         url = self._build_search_url(
             query=(str(query) if isinstance(query, QueryBuilder) else query),
             fields=fields,
@@ -185,28 +669,11 @@ class ProtKB(BaseUniProt):
             compressed=compressed,
             size=size,
         )
-
-        response = self.session.get(url)
+        response = self.session.get(url, stream=True)
         self.check_response(response)
-
-        results = []
-        total_results = int(response.headers.get("x-total-results", 0))
-
-        pbar = tqdm(
-            self._get_batches(response),
-            desc="Fetching data",
-            total=total_results // size + 1,
-        )
-
-        for batch_response, _ in pbar:
-            batch_data = decode_results(
-                batch_response, file_format="tsv", compressed=compressed
-            )
-            if results:
-                batch_data = batch_data[1:]
-            results.extend(batch_data)
-
-            pbar.set_postfix({"fetched": f"{len(results)-1}/{total_results}"})
-
-        df = pd.read_csv(pd.io.common.StringIO("\n".join(results)), sep="\t")
-        return df
+        dtypes = get_registry().label_dtypes if self.typed else None
+        sink = ArrowSink(output)
+        for batch_response, _ in self._get_batches(response):
+            content = page_bytes(batch_response, compressed)
+            sink.write(parse_tsv_page(content, dtypes))
+        return sink.close()
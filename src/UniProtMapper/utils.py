@@ -1,13 +1,27 @@
-"""Module with utility functions for the package."""
+"""Module with utility functions for the package. Heavy dependencies (pandas,
+requests) are imported inside the functions using them, so that importing this
+module, e.g.: to build queries with `UniProtMapper.uniprotkb_fields`, stays cheap."""
 
+import io
 import json
+import os
 import re
 import zlib
+from itertools import islice
 from pathlib import Path
-from typing import Optional
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-import pandas as pd
-import requests
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def get_resource_file(filename: str) -> str:
@@ -41,6 +55,8 @@ def fetch_cross_referenced_db_details(
         output_path = Path(output_path)
     url = "https://rest.uniprot.org/database/stream?&download=true&format=json&query=%28*%29"
     # Make the GET request with modified Accept-Encoding header
+    import requests
+
     response = requests.get(url)
     # Check if the request was successful
     if response.status_code == 200:
@@ -64,7 +80,11 @@ def read_fields_table():
     - `field_type`: the type of information, e.g.: sequence-related, function...
     - `has_full_version`: whether the annotated field contains the full version of the
     dataset or not (in case of cross-references).
-    - `type`: the type of data. Either "cross_reference" or "uniprot_field"."""
+    - `type`: the type of data. Either "cross_reference" or "uniprot_field".
+    - `dtype`: the pandas dtype of the field once parsed, used when requesting typed
+    results. Either "Int64", "Float64", "category" or "string"."""
+    import pandas as pd
+
     csv_path = get_resource_file("resources/uniprot_return_fields.csv")
     return pd.read_csv(csv_path)
 
@@ -79,30 +99,176 @@ def supported_mapping_dbs():
     return sorted([dbs_dict[k][i] for k in dbs_dict for i in range(len(dbs_dict[k]))])
 
 
-def decode_results(response, file_format, compressed):
-    """Decodes the response from the UniProt API."""
-    if compressed:
-        decompressed = zlib.decompress(response.content, 16 + zlib.MAX_WBITS)
-        if file_format == "json":
-            j = json.loads(decompressed.decode("utf-8"))
-            return j
-        elif file_format == "tsv":
-            return [line for line in decompressed.decode("utf-8").split("\n") if line]
-        elif file_format == "xlsx":
-            return [decompressed]
-        elif file_format == "xml":
-            return [decompressed.decode("utf-8")]
-        else:
-            return decompressed.decode("utf-8")
-    elif file_format == "json":
-        return response.json()
-    elif file_format == "tsv":
-        return [line for line in response.text.split("\n") if line]
+def iter_chunks(
+    response,
+    compressed: bool,
+    chunk_size: int = 2**16,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> Iterator[bytes]:
+    """Yield the body of a response as chunks of bytes, decompressing gzip compressed
+    responses incrementally with a `zlib.decompressobj`. Responses requested with
+    `stream=True` are never held in memory as a whole; responses without
+    `iter_content` (e.g.: from httpx) are read from their `content`. If given,
+    `on_chunk` is called with the size of each chunk as received, before
+    decompression, e.g.: to count the bytes of responses without `Content-Length`."""
+    if hasattr(response, "iter_content"):
+        chunks = response.iter_content(chunk_size=chunk_size)
+    else:
+        chunks = [response.content]
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+    for chunk in chunks:
+        if on_chunk is not None:
+            on_chunk(len(chunk))
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        if chunk:
+            yield chunk
+    if decompressor is not None:
+        tail = decompressor.flush()
+        if tail:
+            yield tail
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only binary file over an iterable of chunks of bytes, e.g.: as yielded by
+    `iter_chunks`, so that a streamed response can be parsed by readers expecting a
+    file, such as `pd.read_csv`, without being held in memory as a whole."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = memoryview(chunk)
+        n_bytes = min(len(buffer), len(self._pending))
+        buffer[:n_bytes] = self._pending[:n_bytes]
+        self._pending = self._pending[n_bytes:]
+        return n_bytes
+
+
+def iter_lines(
+    response,
+    compressed: bool,
+    chunk_size: int = 2**16,
+    decode: bool = True,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> Iterator[Union[str, bytes]]:
+    """Incrementally split the body of a response, as yielded by `iter_chunks`, into
+    its non-empty lines, decoded as UTF-8 unless `decode` is False."""
+    pending = b""
+    for chunk in iter_chunks(response, compressed, chunk_size, on_chunk):
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if line:
+                yield line.decode("utf-8") if decode else line
+    if pending:
+        yield pending.decode("utf-8") if decode else pending
+
+
+def append_tsv_page(buffer, chunks: Iterable[bytes], keep_header: bool) -> int:
+    """Write the body of a TSV page, as yielded by `iter_chunks`, to the binary
+    `buffer` chunk by chunk, without splitting it into lines. The header line is
+    dropped unless `keep_header`, so that the pages of a query can be appended to a
+    single buffer.
+
+    Returns:
+        int: the number of rows written, excluding the header.
+    """
+    n_lines, last, skip = 0, b"\n", not keep_header
+    for chunk in chunks:
+        if skip:
+            header_end = chunk.find(b"\n")
+            if header_end < 0:
+                continue
+            chunk, skip = chunk[header_end + 1 :], False
+        if chunk:
+            buffer.write(chunk)
+            n_lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    if last != b"\n":  # don't merge the last row with the first one of the next page
+        buffer.write(b"\n")
+        n_lines += 1
+    return n_lines - 1 if keep_header and n_lines else n_lines
+
+
+def decode_results(response, file_format, compressed, on_chunk=None):
+    """Decodes the response from the UniProt API. TSV responses are returned as a list
+    of their non-empty lines; prefer `iter_lines` or `iter_chunks` to process large
+    responses without holding them in memory. `on_chunk` is passed to `iter_chunks`."""
+    if file_format == "tsv":
+        return list(iter_lines(response, compressed, on_chunk=on_chunk))
+    content = b"".join(iter_chunks(response, compressed, on_chunk=on_chunk))
+    if file_format == "json":
+        return json.loads(content)
     elif file_format == "xlsx":
-        return [response.content]
+        return [content]
     elif file_format == "xml":
-        return [response.text]
-    return response.text
+        return [content.decode("utf-8")]
+    return content.decode("utf-8")
+
+
+def resolve_dtype(dtype: str):
+    """Return the pandas dtype for a `dtype` of the fields table. Strings are stored
+    in Arrow-backed columns if pyarrow is installed."""
+    import pandas as pd
+
+    if dtype == "string":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return pd.StringDtype()
+        return pd.StringDtype("pyarrow")
+    return dtype
+
+
+def apply_dtypes(df: "pd.DataFrame", dtypes: dict) -> "pd.DataFrame":
+    """Cast the columns of a data frame of results, as parsed from the TSV output of
+    the API, to the dtypes in `dtypes` (column label -> pandas dtype). Empty values
+    of numeric columns become missing values; columns missing from `dtypes` are
+    left untouched.
+
+    Raises:
+        ValueError: If a non-empty value of a numeric column can't be parsed, as the
+            typed readers of `ProtKB` do.
+    """
+    import pandas as pd
+
+    converted = {}
+    for column in df.columns:
+        dtype = dtypes.get(column)
+        if dtype is None or df[column].dtype == dtype:
+            continue
+        if dtype in ["Int64", "Float64"]:
+            values = pd.to_numeric(df[column].mask(df[column] == ""))
+            converted[column] = values.astype(dtype)
+        else:
+            converted[column] = df[column].astype(dtype)
+    return df.assign(**converted) if converted else df
+
+
+def concat_frames(dfs: List["pd.DataFrame"]) -> "pd.DataFrame":
+    """Concatenate data frames with the same columns, keeping categorical columns
+    categorical by first unifying their categories."""
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    first = dfs[0]
+    for column in first.columns:
+        if isinstance(first[column].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([df[column] for df in dfs]).categories
+            dfs = [
+                df.assign(**{column: df[column].cat.set_categories(categories)})
+                for df in dfs
+            ]
+    return pd.concat(dfs, ignore_index=True)
 
 
 def get_xml_namespace(element):
@@ -120,3 +286,50 @@ def print_progress_batches(batch_index, size, retrieved, failed):
 def divide_batches(ids):
     """Divides a list of UniProtIDs into batches of 500"""
     return [ids[i : i + 500] for i in range(0, len(ids), 500)]
+
+
+def iter_batches(ids: Iterable[str], size: int = 500) -> Iterator[List[str]]:
+    """Lazily divide an iterable of IDs into lists of at most `size` IDs. Unlike
+    `divide_batches`, the input is never materialized as a whole."""
+    iterator = iter(ids)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_ids(ids: Union[str, os.PathLike, Iterable[str]]) -> Iterator[str]:
+    """Lazily iterate over the IDs passed to `ProtMapper.get`. A string is a single ID,
+    a path-like object (e.g.: `pathlib.Path`) is read as a file with one ID per line,
+    skipping blank lines, and any other iterable is consumed as is."""
+    if isinstance(ids, str):
+        yield ids
+    elif isinstance(ids, os.PathLike):
+        with open(ids, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield line
+    else:
+        yield from ids
+
+
+def normalize_ids(ids: Iterable[str], upper: bool = False) -> List[str]:
+    """Strip surrounding whitespace from the IDs and, if `upper`, make them uppercase."""
+    if upper:
+        return [_id.strip().upper() for _id in ids]
+    return [_id.strip() for _id in ids]
+
+
+def deduplicate_ids(
+    ids: Iterable[str], upper: bool = False
+) -> Tuple[List[str], List[str]]:
+    """Normalize the IDs with `normalize_ids` and remove duplicates in O(n).
+
+    Returns:
+        Tuple[List[str], List[str]]: the unique normalized IDs, in order of first
+        appearance, and the normalized version of each input ID.
+    """
+    normalized = normalize_ids(ids, upper=upper)
+    return list(dict.fromkeys(normalized)), normalized
@@ -0,0 +1,201 @@
+"""In-memory stand-in for the UniProt REST API, used by the offline tests. Mount it on
+a `requests.Session` with `FakeUniProt.mount(session)`, or use it as the transport of
+an `httpx.AsyncClient` with `FakeUniProt.httpx_transport()`.
+
+Behaviour of the ID mapping endpoints:
+- IDs starting with "X" fail to map, IDs starting with "M" map to two rows;
+- a job containing the ID "BOOM" fails with a server error when polled;
+- each job reports `RUNNING` for `running_polls` status checks before finishing.
+"""
+
+import gzip
+import io
+import json
+import re
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+API_URL = "https://rest.uniprot.org"
+RELEASE = "2024_01"
+
+
+class FakeUniProt:
+    def __init__(self, running_polls=0, kb_rows=5, page_size=None):
+        self.running_polls = running_polls
+        self.kb_rows = [
+            {
+                "Entry": f"P{i:05d}",
+                "Entry Name": f"P{i:05d}_HUMAN",
+                "Length": str(50 + 10 * i),
+                "Organism (ID)": "9606" if i % 2 else "10090",
+            }
+            for i in range(kb_rows)
+        ]
+        self.page_size = page_size  # overrides the requested `size` if set
+        self.jobs = {}
+        self.n_submitted = 0
+        self.log = []  # (method, path, params) of each request
+
+    def mount(self, session):
+        session.mount(API_URL, _FakeAdapter(self))
+        return session
+
+    def httpx_transport(self):
+        import httpx
+
+        def handler(request):
+            status, headers, content = self.handle(
+                request.method, str(request.url), request.content.decode()
+            )
+            return httpx.Response(status, headers=headers, content=content)
+
+        return httpx.MockTransport(handler)
+
+    def paths(self, prefix=""):
+        return [path for _, path, _ in self.log if path.startswith(prefix)]
+
+    # ID mapping
+
+    def _rows(self, job):
+        if job["to"] in ["UniProtKB", "UniProtKB-Swiss-Prot"]:
+            header = "From\tEntry\tLength"
+            make = lambda i, n: f"{i}\t{i}{'-' + str(n) if n else ''}\t{len(i)}"  # noqa
+        else:
+            header = "From\tTo"
+            make = lambda i, n: f"{i}\t{i.lower()}{'-' + str(n) if n else ''}"  # noqa
+        rows = []
+        for _id in job["ids"]:
+            if _id.startswith("X"):
+                continue
+            rows.extend(make(_id, n) for n in range(2 if _id.startswith("M") else 1))
+        return header, rows
+
+    def _results_url(self, job_id):
+        job = self.jobs[job_id]
+        kb = "uniprotkb/" if job["to"] in ["UniProtKB", "UniProtKB-Swiss-Prot"] else ""
+        return f"{API_URL}/idmapping/{kb}results/{job_id}"
+
+    def handle(self, method, url, body):
+        parsed = urlparse(url)
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        path = parsed.path
+        self.log.append((method, path, params))
+
+        if path == "/idmapping/run":
+            form = {k: v[-1] for k, v in parse_qs(body).items()}
+            job_id = f"job{self.n_submitted}"
+            self.n_submitted += 1
+            self.jobs[job_id] = {
+                "ids": form["ids"].split(","),
+                "from": form["from"],
+                "to": form["to"],
+                "polls": 0,
+            }
+            return _json({"jobId": job_id})
+
+        match = re.match(r"/idmapping/status/(\w+)$", path)
+        if match:
+            job = self.jobs.get(match.group(1))
+            if job is None:
+                return _json({"messages": ["Resource not found"]}, 404)
+            if "BOOM" in job["ids"]:
+                return _json({"messages": ["Internal server error"]}, 500)
+            job["polls"] += 1
+            if job["polls"] <= self.running_polls:
+                return _json({"jobStatus": "RUNNING"})
+            location = self._results_url(match.group(1))
+            status, headers, content = _json({"jobStatus": "FINISHED"}, 303)
+            headers["Location"] = location
+            return status, headers, content
+
+        match = re.match(r"/idmapping/details/(\w+)$", path)
+        if match:
+            return _json({"redirectURL": self._results_url(match.group(1))})
+
+        match = re.match(r"/idmapping/(?:uniprotkb/)?results/(stream/)?(\w+)$", path)
+        if match:
+            job = self.jobs[match.group(2)]
+            header, rows = self._rows(job)
+            if params.get("format", "json") == "json":
+                results = [{"from": r.split("\t")[0]} for r in rows]
+                return _json({"results": results, "failedIds": []})
+            if match.group(1):
+                return _tsv(header, rows, params)
+            return self._paginated(url, header, rows, params)
+
+        if path in ["/uniprotkb/search", "/uniprotkb/stream"]:
+            rows = self._kb_filter(params.get("query", ""))
+            header = "Entry\tEntry Name\tLength\tOrganism (ID)"
+            lines = ["\t".join(r.values()) for r in rows]
+            if path == "/uniprotkb/stream":
+                return _tsv(header, lines, params)
+            return self._paginated(url, header, lines, params)
+
+        return _json({"messages": ["Resource not found"]}, 404)
+
+    def _kb_filter(self, query):
+        rows = self.kb_rows
+        for field, lo, hi in re.findall(r"(\w+):\[(\S+) TO (\S+)\]", query):
+            column = {"length": "Length", "organism_id": "Organism (ID)"}[field]
+            rows = [
+                r
+                for r in rows
+                if (lo == "*" or int(r[column]) >= int(lo))
+                and (hi == "*" or int(r[column]) <= int(hi))
+            ]
+        return rows
+
+    def _paginated(self, url, header, rows, params):
+        size = self.page_size or int(params.get("size", 25))
+        start = int(params.get("cursor", 0))
+        page = rows[start : start + size] if size else []
+        status, headers, content = _tsv(header, page, params)
+        headers["x-total-results"] = str(len(rows))
+        if size and start + size < len(rows):
+            parsed = urlparse(url)
+            next_params = dict(params, cursor=start + size)
+            next_url = f"{API_URL}{parsed.path}?{urlencode(next_params)}"
+            headers["Link"] = f'<{next_url}>; rel="next"'
+        return status, headers, content
+
+
+def _json(content, status=200):
+    headers = {"Content-Type": "application/json", "X-UniProt-Release": RELEASE}
+    return status, headers, json.dumps(content).encode()
+
+
+def _tsv(header, rows, params):
+    content = "\n".join([header] + list(rows)).encode() + b"\n"
+    if params.get("compressed", "false") == "true":
+        content = gzip.compress(content)
+    headers = {"Content-Type": "text/plain;format=tsv", "X-UniProt-Release": RELEASE}
+    return 200, headers, content
+
+
+class _FakeAdapter(BaseAdapter):
+    def __init__(self, fake):
+        super().__init__()
+        self.fake = fake
+
+    def send(self, request, stream=False, **kwargs):
+        body = request.body or ""
+        if isinstance(body, bytes):
+            body = body.decode()
+        status, headers, content = self.fake.handle(request.method, request.url, body)
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = io.BytesIO(content)
+        response.url = request.url
+        response.request = request
+        response.encoding = "utf-8"
+        if not stream:
+            response._content = content
+            response._content_consumed = True
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,61 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from fake_uniprot import FakeUniProt
+
+from UniProtMapper import ProtKB, ProtMapper
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class TestArrowResults(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeUniProt(page_size=2)
+        self.ids = ["P1", "X2", "M33", "P4"]
+
+    def _client(self, cls, **kwargs):
+        client = cls(**kwargs)
+        self.fake.mount(client.session)
+        return client
+
+    def test_protmapper_table(self):
+        mapper = self._client(ProtMapper)
+        table, failed = mapper.get_arrow(self.ids, to_db="UniProtKB")
+        self.assertIsInstance(table, pa.Table)
+        self.assertEqual(table.column("From").to_pylist(), ["P1", "M33", "M33", "P4"])
+        self.assertEqual(table.schema.field("Length").type, pa.string())
+        self.assertEqual(failed, ["X2"])
+
+        mapper = self._client(ProtMapper, typed=True)
+        table, _ = mapper.get_arrow(self.ids, to_db="UniProtKB", compressed=False)
+        self.assertEqual(table.schema.field("Length").type, pa.int64())
+        self.assertEqual(table.column("Length").to_pylist(), [2, 3, 3, 2])
+
+    def test_parquet_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / "results.parquet"
+            path, failed = self._client(ProtMapper).get_arrow(
+                self.ids, to_db="PDB", output=output
+            )
+            self.assertEqual(path, output)
+            table = pq.read_table(output)
+            self.assertEqual(
+                table.column("To").to_pylist(), ["p1", "m33", "m33-1", "p4"]
+            )
+
+            output = Path(tmp) / "protkb.parquet"
+            protkb = self._client(ProtKB, typed=True)
+            protkb.get_arrow("reviewed:true", fields=["accession"], output=output)
+            table = pq.read_table(output)
+            self.assertEqual(table.num_rows, 5)
+            self.assertEqual(table.schema.field("Organism (ID)").type, pa.int64())
+
+
+if __name__ == "__main__":
+    unittest.main()
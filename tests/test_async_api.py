@@ -0,0 +1,104 @@
+import asyncio
+import contextlib
+import io
+import unittest
+
+import pandas as pd
+from fake_uniprot import RELEASE, FakeUniProt
+
+from UniProtMapper.cache import MemoryCache
+
+try:
+    import httpx
+
+    from UniProtMapper import AsyncProtKB, AsyncProtMapper
+except ImportError:  # optional dependency
+    httpx = None
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class TestAsyncClients(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeUniProt(running_polls=1, page_size=2)
+
+    def _patch_session(self, client):
+        client.session = httpx.AsyncClient(
+            transport=self.fake.httpx_transport(), follow_redirects=True
+        )
+        return client
+
+    def test_async_protmapper(self):
+        ids = ["P1", "Q2", "X3", "P4", "Q5"]
+
+        async def run():
+            async with self._patch_session(AsyncProtMapper()) as mapper:
+                return await mapper.get(ids, to_db="PDB")
+
+        result_df, failed = asyncio.run(run())
+        self.assertEqual(result_df["From"].tolist(), ["P1", "Q2", "P4", "Q5"])
+        self.assertEqual(result_df["To"].tolist(), ["p1", "q2", "p4", "q5"])
+        self.assertEqual(failed, ["X3"])
+        self.assertEqual(self.fake.paths("/idmapping/details"), [])
+
+    def test_async_protmapper_batches(self):
+        ids = [f"P{i}" if i % 100 else f"X{i}" for i in range(1200)]
+        self.fake.page_size = None
+
+        async def run():
+            async with self._patch_session(AsyncProtMapper()) as mapper:
+                return await mapper.get(ids, to_db="PDB", compressed=False)
+
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            result_df, failed = asyncio.run(run())
+        self.assertEqual(stdout.getvalue().splitlines(), ["Fetched: 1188 / 1200"])
+        self.assertEqual(len(self.fake.jobs), 3)
+        self.assertEqual(result_df["From"].tolist(), [i for i in ids if i[0] == "P"])
+        self.assertEqual(failed, [i for i in ids if i[0] == "X"])
+
+    def test_async_protkb(self):
+        async def run():
+            async with self._patch_session(AsyncProtKB()) as protkb:
+                return await protkb.get("reviewed:true", fields=["accession", "id"])
+
+        result = asyncio.run(run())
+        self.assertIsInstance(result, pd.DataFrame)
+        self.assertEqual(result["Entry"].tolist(), [f"P{i:05d}" for i in range(5)])
+
+    def test_async_cache_and_typed(self):
+        cache = MemoryCache()
+        self.fake.page_size = None
+
+        async def run():
+            async with self._patch_session(
+                AsyncProtMapper(cache=cache, typed=True)
+            ) as mapper:
+                await mapper.get(["P1", "X2"], to_db="UniProtKB")
+                mapped = await mapper.get(["X2", "P1", "P3"], to_db="UniProtKB")
+                release = mapper.uniprot_release
+            async with self._patch_session(AsyncProtKB(cache=cache, typed=True)) as kb:
+                fields = ["accession", "length"]
+                await kb.get("reviewed:true", fields=fields)
+                return mapped, release, await kb.get("reviewed:true", fields=fields)
+
+        (df, failed), release, kb_df = asyncio.run(run())
+        self.assertEqual(len(self.fake.jobs), 2)
+        self.assertEqual(self.fake.jobs["job1"]["ids"], ["P3"])
+        self.assertEqual(df["From"].tolist(), ["P1", "P3"])
+        self.assertEqual(df["Length"].dtype, "Int64")
+        self.assertEqual(failed, ["X2"])
+        self.assertEqual(release, RELEASE)
+        self.assertEqual(kb_df["Length"].dtype, "Int64")
+        self.assertEqual(len(self.fake.paths("/uniprotkb/search")), 1)
+
+    def test_invalid_field(self):
+        async def run():
+            async with self._patch_session(AsyncProtKB()) as protkb:
+                await protkb.get("reviewed:true", fields=["invalid_field"])
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
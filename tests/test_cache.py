@@ -0,0 +1,156 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from fake_uniprot import RELEASE, FakeUniProt
+
+from UniProtMapper import ProtKB, ProtMapper
+from UniProtMapper.cache import MemoryCache, SQLiteCache
+
+
+class TestSQLiteCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "cache.sqlite"
+
+    def test_roundtrip_and_persistence(self):
+        cache = SQLiteCache(self.path)
+        cache.set_many([("a", (["From"], [["A"]])), ("b", (["From"], []))])
+        cache.close()
+        cache = SQLiteCache(self.path)
+        self.assertEqual(
+            cache.get_many(["a", "b", "c"]),
+            {
+                "a": (["From"], [["A"]]),
+                "b": (["From"], []),
+            },
+        )
+        self.assertIsNone(cache.get("c"))
+        cache.close()
+
+    def test_lru_eviction(self):
+        cache = SQLiteCache(self.path, max_bytes=150)
+        cache.set("old", os.urandom(50))  # ~60 bytes once pickled and compressed
+        time.sleep(0.01)
+        cache.set("recent", os.urandom(50))
+        time.sleep(0.01)
+        cache.get("old")  # "recent" is now the least recently used
+        time.sleep(0.01)
+        cache.set("new", os.urandom(50))
+        self.assertIn("old", cache)
+        self.assertNotIn("recent", cache)
+        self.assertIn("new", cache)
+        cache.close()
+
+    def test_ttl_and_release(self):
+        cache = SQLiteCache(self.path, ttl=0.05)
+        cache.set("a", 1, release="2023_05")
+        cache.set("b", 2, release="2024_01")
+        self.assertEqual(cache.invalidate(release="2024_01"), 1)
+        self.assertEqual(cache.get_many(["a", "b"]), {"b": 2})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.invalidate(release="2024_01"), 1)  # expired
+        self.assertEqual(len(cache), 0)
+        with self.assertRaises(ValueError):
+            cache.invalidate(release=None)
+        cache.close()
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_byte_budget_and_stats(self):
+        cache = MemoryCache(max_bytes=1000)
+        cache.set("a", "x" * 400)
+        cache.set("b", "y" * 400)
+        cache.get("a")  # "b" is now the least recently used
+        cache.set("c", "z" * 400)
+        self.assertEqual(cache.get_many(["a", "b", "c"]).keys(), {"a", "c"})
+        self.assertLessEqual(cache.size, 1000)
+        self.assertEqual(cache.stats, {"hits": 3, "misses": 1, "evictions": 1})
+
+    def test_ttl_and_release(self):
+        cache = MemoryCache(ttl=0.05)
+        cache.set("a", 1, release="2023_05")
+        cache.set("b", 2, release="2024_01")
+        self.assertEqual(cache.invalidate(release="2024_01"), 1)
+        self.assertEqual(cache.get_many(["a", "b"]), {"b": 2})
+        time.sleep(0.06)
+        self.assertNotIn("b", cache)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 0)
+
+
+class TestProtMapperCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.cache = SQLiteCache(Path(self.tmpdir.name) / "cache.sqlite")
+        self.addCleanup(self.cache.close)
+        self.fake = FakeUniProt()
+        self.mapper = ProtMapper(cache=self.cache)
+        self.fake.mount(self.mapper.session)
+
+    def test_warm_rerun_only_submits_new_ids(self):
+        first_df, first_failed = self.mapper.get(["P1", "X2", "M3"], to_db="PDB")
+        df, failed = self.mapper.get(["M3", "P4", "X2", "P1"], to_db="PDB")
+        self.assertEqual(len(self.fake.jobs), 2)
+        self.assertEqual(self.fake.jobs["job1"]["ids"], ["P4"])
+        self.assertEqual(df["From"].tolist(), ["M3", "M3", "P4", "P1"])
+        self.assertEqual(df["To"].tolist(), ["m3", "m3-1", "p4", "p1"])
+        self.assertEqual(failed, ["X2"])
+        self.assertEqual(self.cache.invalidate(release=RELEASE), 0)
+
+        mapper = ProtMapper(cache=self.cache)
+        self.fake.mount(mapper.session)
+        mapper.get(["P1", "P4"], to_db="PDB")  # fully cached
+        self.assertEqual(len(self.fake.jobs), 2)
+        self.assertIsNone(mapper.uniprot_release)
+        self.assertEqual(self.cache.invalidate(release=mapper.fetch_release()), 0)
+
+    def test_cache_keyed_on_target(self):
+        self.mapper.get(["P1"], to_db="PDB")
+        df, _ = self.mapper.get(["P1"], to_db="UniProtKB")
+        self.assertEqual(len(self.fake.jobs), 2)
+        self.assertEqual(df.columns.tolist(), ["From", "Entry", "Length"])
+
+    def test_errored_batches_not_cached(self):
+        cache = MemoryCache()
+        mapper = ProtMapper(cache=cache)
+        self.fake.mount(mapper.session)
+        ids = [f"P{i}" for i in range(1500)]
+        ids[600] = "BOOM"  # the second batch fails on the server side
+        _, failed = mapper.get(ids, to_db="PDB", max_workers=4)
+        self.assertEqual(failed, ids[500:1000])
+
+        ids[600] = "P600"
+        df, failed = mapper.get(ids, to_db="PDB", max_workers=4)
+        self.assertEqual(len(self.fake.jobs), 4)
+        self.assertEqual(self.fake.jobs["job3"]["ids"], ids[500:1000])
+        self.assertEqual(df["From"].tolist(), ids)
+        self.assertEqual(failed, [])
+
+
+class TestSharedMemoryCache(unittest.TestCase):
+    def test_shared_between_clients(self):
+        cache = MemoryCache()
+        fake = FakeUniProt()
+        mapper, protkb = ProtMapper(cache=cache), ProtKB(cache=cache)
+        fake.mount(mapper.session)
+        fake.mount(protkb.session)
+
+        mapper.get(["P1", "P2"], to_db="PDB")
+        mapper.get(["P2"], to_db="PDB")
+        df = protkb.get("reviewed:true", fields=["accession", "length"])
+        df["Entry"] = None  # results returned from the cache are copies
+        cached_df = protkb.get("reviewed:true", fields=["accession", "length"])
+        self.assertEqual(cached_df["Entry"].tolist(), [f"P{i:05d}" for i in range(5)])
+        self.assertEqual(len(fake.paths("/uniprotkb/search")), 1)
+        self.assertEqual(len(fake.jobs), 1)
+        self.assertEqual(cache.stats["hits"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from fake_uniprot import FakeUniProt
+
+from UniProtMapper import ProtMapper
+from UniProtMapper.checkpoint import MappingCheckpoint
+
+
+class TestCheckpointedMapping(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.fake = FakeUniProt()
+        self.ids = [f"P{i:05d}" if i % 7 else f"X{i:05d}" for i in range(1234)]
+        self.expected = (
+            [i for i in self.ids if i[0] == "P"],
+            [i for i in self.ids if i[0] == "X"],
+        )
+
+    def _mapper(self):
+        mapper = ProtMapper()
+        self.fake.mount(mapper.session)
+        return mapper
+
+    def _interrupted_run(self, max_workers=1):
+        """Run `get` until the results of the last batch are being fetched."""
+        mapper = self._mapper()
+        fetch = mapper._fetch_results
+
+        def _fetch_results(results_url, ids, *args):
+            if ids[0] == self.ids[1000]:
+                raise ConnectionError("network blip")
+            return fetch(results_url, ids, *args)
+
+        with mock.patch.object(mapper, "_fetch_results", side_effect=_fetch_results):
+            try:
+                mapper.get(
+                    self.ids,
+                    to_db="PDB",
+                    max_workers=max_workers,
+                    checkpoint_dir=self.tmpdir.name,
+                )
+            except ConnectionError:
+                pass
+
+    def test_resume_skips_finished_batches(self):
+        self._interrupted_run()
+        self.assertEqual(len(self.fake.jobs), 3)
+        self.fake.log.clear()
+        result_df, failed = self._mapper().get(
+            self.ids, to_db="PDB", checkpoint_dir=self.tmpdir.name
+        )
+        self.assertEqual((result_df["From"].tolist(), failed), self.expected)
+        # the last job is reattached, not resubmitted
+        self.assertEqual(len(self.fake.jobs), 3)
+        self.assertEqual(
+            self.fake.paths("/idmapping/results"), ["/idmapping/results/job2"]
+        )
+
+    def test_resume_concurrent_run(self):
+        self._interrupted_run(max_workers=3)
+        checkpoint = MappingCheckpoint(self.tmpdir.name, None, "UniProtKB_AC-ID", "PDB")
+        self.assertEqual(len(checkpoint), 2)
+        result_df, failed = self._mapper().get(
+            self.ids, to_db="PDB", max_workers=3, checkpoint_dir=self.tmpdir.name
+        )
+        self.assertEqual((result_df["From"].tolist(), failed), self.expected)
+        self.assertEqual(len(self.fake.jobs), 3)
+
+    def test_expired_job_is_resubmitted(self):
+        self._interrupted_run()
+        del self.fake.jobs["job2"]
+        result_df, failed = self._mapper().get(
+            self.ids, to_db="PDB", checkpoint_dir=self.tmpdir.name
+        )
+        self.assertEqual((result_df["From"].tolist(), failed), self.expected)
+        self.assertEqual(self.fake.paths("/idmapping/run"), ["/idmapping/run"] * 4)
+
+    def test_typed_runs(self):
+        ids = ["P1", "X2", "P3"]
+        self._mapper().get(ids, to_db="UniProtKB", checkpoint_dir=self.tmpdir.name)
+        for n_jobs in [2, 2]:  # resubmitted once, then loaded from the checkpoint
+            mapper = ProtMapper(typed=True)
+            self.fake.mount(mapper.session)
+            result_df, failed = mapper.get(
+                ids, to_db="UniProtKB", checkpoint_dir=self.tmpdir.name
+            )
+            self.assertEqual(len(self.fake.jobs), n_jobs)
+            self.assertEqual(result_df["Length"].dtype, "Int64")
+            self.assertEqual(failed, ["X2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
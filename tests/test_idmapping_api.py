@@ -1,8 +1,24 @@
+import gzip
+import io
+import json
+import tempfile
 import unittest
+from pathlib import Path
+from unittest import mock
 
 import pandas as pd
+import requests
+from fake_uniprot import FakeUniProt
 
 from UniProtMapper import ProtMapper
+from UniProtMapper.polling import JobPoller
+from UniProtMapper.utils import (
+    ChunkReader,
+    append_tsv_page,
+    apply_dtypes,
+    decode_results,
+    iter_lines,
+)
 
 # Test data
 test_ids = ["P30542", "Q16678", "Q02880"]
@@ -11,6 +27,14 @@ test_ids = ["P30542", "Q16678", "Q02880"]
 mapper = ProtMapper()
 
 
+def json_response(content, status_code=200, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(content).encode()
+    response.headers.update(headers or {})
+    return response
+
+
 class TestProtMapper(unittest.TestCase):
     def setUp(self):
         self.fields_table = ProtMapper().fields_table
@@ -65,5 +89,331 @@ class TestProtMapper(unittest.TestCase):
             mapper.get(test_ids, to_db="InvalidDB")
 
 
+class TestProtMapperOffline(unittest.TestCase):
+    """Offline tests of the job lifecycle and batch scheduling in `ProtMapper.get`."""
+
+    def setUp(self):
+        self.fake = FakeUniProt(running_polls=1)
+        self.mapper = ProtMapper()
+        self.fake.mount(self.mapper.session)
+        self.ids = [f"P{i:05d}" if i % 7 else f"X{i:05d}" for i in range(1234)]
+
+    def test_round_trips(self):
+        result_df, failed = self.mapper.get(["P1", "X2", "M3"], to_db="PDB")
+        self.assertEqual(result_df["From"].tolist(), ["P1", "M3", "M3"])
+        self.assertEqual(failed, ["X2"])
+        # submit, 2 status checks and a single page of results
+        self.assertEqual(
+            self.fake.paths(),
+            [
+                "/idmapping/run",
+                "/idmapping/status/job0",
+                "/idmapping/status/job0",
+                "/idmapping/results/job0",
+            ],
+        )
+        self.assertEqual(self.mapper.job_stats["job0"]["round_trips"], 4)
+        self.assertGreater(self.mapper.job_stats["job0"]["bytes"], 0)
+
+    def test_streamed_bytes_counted(self):
+        fake = FakeUniProt(running_polls=1, page_size=100)
+        fake.mount(self.mapper.session)
+        served = []  # (job ID, path, size of the body) of each response
+        handle = fake.handle
+
+        def _handle(method, url, body):
+            status, headers, content = handle(method, url, body)
+            path = fake.log[-1][1]
+            if path == "/idmapping/run":
+                job_id = json.loads(content)["jobId"]
+            else:
+                job_id = path.rsplit("/", 1)[-1]
+            served.append((job_id, path, len(content)))
+            return status, headers, content
+
+        fake.handle = _handle
+        ids = [f"P{i}" for i in range(450)]
+        self.mapper.get(ids, to_db="PDB")  # 5 pages of results
+        self.mapper.stream_threshold = 100
+        self.mapper.get(ids, to_db="PDB")  # a page, then the stream endpoint
+        job0 = self.mapper.job_stats["job0"]
+        self.assertEqual(job0["round_trips"], 8)
+        self.assertEqual(job0["bytes"], sum(n for j, _, n in served if j == "job0"))
+        # the body of the first page is left unread when switching to the stream
+        job1 = self.mapper.job_stats["job1"]
+        self.assertEqual(job1["round_trips"], 5)
+        self.assertEqual(
+            job1["bytes"],
+            sum(
+                n
+                for j, p, n in served
+                if j == "job1" and p != "/idmapping/results/job1"
+            ),
+        )
+
+    def test_iter_get(self):
+        self.fake.page_size = 2
+        pages = list(self.mapper.iter_get(["P1", "X2", "M3", "P4", "X5"], to_db="PDB"))
+        self.assertEqual(
+            [page["From"].tolist() for page, _ in pages],
+            [["P1", "M3"], ["M3", "P4"]],
+        )
+        self.assertEqual([failed for _, failed in pages], [[], ["X2", "X5"]])
+        result_df, failed = self.mapper.get(["P1", "X2", "M3", "P4", "X5"], to_db="PDB")
+        self.assertEqual(result_df["From"].tolist(), ["P1", "M3", "M3", "P4"])
+        self.assertEqual(result_df.index.tolist(), [0, 1, 2, 3])
+
+    def test_stream_large_jobs(self):
+        self.fake.page_size = 2
+        self.mapper.stream_threshold = 3
+        ids = ["P1", "X2", "M3", "P4", "P5"]
+        for compressed in [True, False]:
+            result_df, failed = self.mapper.get(ids, to_db="PDB", compressed=compressed)
+            self.assertEqual(result_df["From"].tolist(), ["P1", "M3", "M3", "P4", "P5"])
+            self.assertEqual(failed, ["X2"])
+        # the first page reports 5 results, so the rest comes from the stream endpoint
+        self.assertEqual(
+            self.fake.paths("/idmapping/results"),
+            ["/idmapping/results/job0", "/idmapping/results/stream/job0"]
+            + ["/idmapping/results/job1", "/idmapping/results/stream/job1"],
+        )
+        pages = list(
+            self.mapper._iter_stream_pages(
+                None, self.fake._results_url("job0"), True, rows=2
+            )
+        )
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+    def test_lazy_input_and_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            id_file = Path(tmp) / "ids.txt"
+            id_file.write_text("\n".join(self.ids[:600]) + "\n\n")
+            output = Path(tmp) / "mapped.tsv"
+            path, failed = self.mapper.get(id_file, to_db="PDB", output=output)
+            self.assertEqual(path, output)
+            written = pd.read_csv(output, sep="\t")
+            self.assertEqual(
+                written["From"].tolist(), [i for i in self.ids[:600] if i[0] == "P"]
+            )
+            self.assertEqual(failed, [i for i in self.ids[:600] if i[0] == "X"])
+        result_df, failed = self.mapper.get((i for i in self.ids[:10]), to_db="PDB")
+        self.assertEqual(result_df["From"].tolist(), self.ids[1:7] + self.ids[8:10])
+        self.assertEqual(failed, [self.ids[0], self.ids[7]])
+
+    def test_get_path(self):
+        ids = ["E1", "X2", "M3"] + [f"E{i}" for i in range(10, 1010)]
+        result_df, failed = self.mapper.get_path(
+            ids, ["Ensembl", "UniProtKB", "PDB"], max_workers=2
+        )
+        self.assertEqual(result_df.columns.tolist(), ["From", "UniProtKB", "To"])
+        self.assertEqual(
+            result_df.head(4).values.tolist(),
+            [
+                ["E1", "E1", "e1"],
+                ["M3", "M3", "m3"],
+                ["M3", "M3", "m3-1"],
+                ["M3", "M3-1", "m3-1"],
+            ],
+        )
+        self.assertEqual(failed, ["X2"])
+        submitted = [job["from"] for job in self.fake.jobs.values()]
+        self.assertEqual(submitted.count("Ensembl"), 3)
+        self.assertEqual(submitted.count("UniProtKB_AC-ID"), 3)
+        with self.assertRaises(ValueError):
+            self.mapper.get_path(ids, ["Ensembl"])
+
+    def test_get_many(self):
+        targets = ["PDB", "UniProtKB", "STRING"]
+        results, failed = self.mapper.get_many(self.ids, targets=targets)
+        self.assertEqual(list(results), targets)
+        self.assertEqual(len(self.fake.jobs), 9)
+        for target in targets:
+            self.assertEqual(
+                results[target]["From"].tolist(), [i for i in self.ids if i[0] == "P"]
+            )
+            self.assertEqual(failed[target], [i for i in self.ids if i[0] == "X"])
+        self.assertEqual(results["UniProtKB"]["Entry"].tolist()[:2], self.ids[1:3])
+
+        ids = ["p1", "P1", "X2"]
+        long_df, failed = self.mapper.get_many(
+            ids, targets=["PDB", "UniProtKB"], deduplicate=True, long_format=True
+        )
+        self.assertEqual(long_df.columns.tolist(), ["From", "Target", "To"])
+        self.assertEqual(
+            long_df.values.tolist(),
+            [
+                ["p1", "PDB", "p1"],
+                ["P1", "PDB", "p1"],
+                ["p1", "UniProtKB", "P1"],
+                ["P1", "UniProtKB", "P1"],
+            ],
+        )
+        self.assertEqual(failed, {"PDB": ["X2"], "UniProtKB": ["X2"]})
+
+    def test_typed_results(self):
+        self.fake.page_size = 2
+        mapper = ProtMapper(typed=True)
+        self.fake.mount(mapper.session)
+        result_df, failed = mapper.get(["P1", "X2", "M33", "P4"], to_db="UniProtKB")
+        self.assertEqual(result_df["Length"].tolist(), [2, 3, 3, 2])
+        self.assertEqual(str(result_df["Length"].dtype), "Int64")
+        self.assertIsInstance(result_df["Entry"].dtype, pd.StringDtype)
+
+        pages = [
+            (pd.DataFrame({"Organism": pd.Categorical(values)}), [])
+            for values in [["Human", "Mouse"], ["Rat", "Human"]]
+        ]
+        merged, _ = ProtMapper._merge_batch_results(pages)
+        self.assertIsInstance(merged["Organism"].dtype, pd.CategoricalDtype)
+        self.assertEqual(
+            merged["Organism"].tolist(), ["Human", "Mouse", "Rat", "Human"]
+        )
+
+    def test_deduplicate(self):
+        ids = [" p1", "P1", "X2", "m3 ", "x2", "P1"]
+        result_df, failed = self.mapper.get(ids, to_db="PDB", deduplicate=True)
+        self.assertEqual(self.fake.jobs["job0"]["ids"], ["P1", "X2", "M3"])
+        self.assertEqual(result_df["From"].tolist(), [" p1", "P1", "m3 ", "m3 ", "P1"])
+        self.assertEqual(result_df["To"].tolist(), ["p1", "p1", "m3", "m3-1", "p1"])
+        self.assertEqual(failed, ["X2", "x2"])
+        self.assertEqual(
+            self.mapper.dedup_stats, {"input": 6, "submitted": 3, "saved": 3}
+        )
+
+    def test_concurrent_batches_keep_order(self):
+        result_df, failed = self.mapper.get(self.ids, to_db="PDB", max_workers=4)
+        self.assertEqual(len(self.fake.jobs), 3)
+        self.assertEqual(
+            result_df["From"].tolist(), [i for i in self.ids if i[0] == "P"]
+        )
+        self.assertEqual(failed, [i for i in self.ids if i[0] == "X"])
+
+    def test_concurrent_batch_isolation(self):
+        ids = self.ids[:]
+        ids[600] = "BOOM"  # the second batch fails on the server side
+        result_df, failed = self.mapper.get(ids, to_db="PDB", max_workers=4)
+        expected = ids[:500] + ids[1000:]
+        self.assertEqual(
+            result_df["From"].tolist(), [i for i in expected if i[0] == "P"]
+        )
+        expected_failed = (
+            [i for i in ids[:500] if i[0] == "X"]
+            + ids[500:1000]
+            + [i for i in ids[1000:] if i[0] == "X"]
+        )
+        self.assertEqual(failed, expected_failed)
+
+    def test_concurrent_batches_bounded(self):
+        ids = [f"P{i}" for i in range(3000)]
+        result_df, _ = self.mapper.get(ids, to_db="PDB", max_workers=2)
+        self.assertEqual(result_df["From"].tolist(), ids)
+        # jobs submitted and not yet retrieved, before each request
+        outstanding, max_outstanding, fetched = 0, 0, set()
+        for path in self.fake.paths():
+            if path == "/idmapping/run":
+                outstanding += 1
+            elif path.startswith("/idmapping/results/") and path not in fetched:
+                fetched.add(path)
+                outstanding -= 1
+            max_outstanding = max(max_outstanding, outstanding)
+        self.assertEqual(len(fetched), 6)
+        self.assertEqual(max_outstanding, 2)
+
+    def test_sequential_batches_raise(self):
+        with self.assertRaises(requests.HTTPError):
+            self.mapper.get(["BOOM"] + self.ids, to_db="PDB")
+
+    def test_polling_stats(self):
+        self.mapper.get(self.ids[:10], to_db="PDB")
+        stats = self.mapper.polling_stats()
+        self.assertEqual(stats["n"], 1)
+        self.assertLess(stats["max"], 1)
+
+
+class TestDecodeResults(unittest.TestCase):
+    def _response(self, content: bytes):
+        response = requests.Response()
+        response.raw = io.BytesIO(content)
+        return response
+
+    def test_iter_lines(self):
+        body = "From\tTo\n" + "".join(f"P{i}\tp{i}\n" for i in range(1000))
+        for compressed in [True, False]:
+            content = gzip.compress(body.encode()) if compressed else body.encode()
+            lines = iter_lines(self._response(content), compressed, chunk_size=7)
+            self.assertEqual(list(lines), body.splitlines())
+            response = self._response(content)
+            self.assertEqual(
+                decode_results(response, "tsv", compressed), body.splitlines()
+            )
+        response = self._response(gzip.compress(b'{"jobId": "job0"}'))
+        self.assertEqual(decode_results(response, "json", True), {"jobId": "job0"})
+
+    def test_apply_dtypes(self):
+        df = pd.DataFrame({"Length": ["10", "", "30", ""], "Entry": ["a"] * 4})
+        typed = apply_dtypes(df, {"Length": "Int64"})
+        self.assertEqual(typed["Length"].tolist(), [10, pd.NA, 30, pd.NA])
+        self.assertEqual(typed["Entry"].tolist(), ["a"] * 4)
+        with self.assertRaises(ValueError):  # not coerced to a missing value
+            apply_dtypes(pd.DataFrame({"Length": ["47,409"]}), {"Length": "Int64"})
+
+    def test_chunk_reader(self):
+        chunks = [b"From\tTo\nP1", b"", b"\tp1\n", b"P2\tp2\n"]
+        reader = ChunkReader(chunks)
+        self.assertEqual(reader.read(3), b"Fro")
+        self.assertEqual(reader.read(), b"".join(chunks)[3:])
+        self.assertEqual(reader.read(), b"")
+        df = pd.read_csv(ChunkReader(chunks), sep="\t")
+        self.assertEqual(df["To"].tolist(), ["p1", "p2"])
+
+    def test_append_tsv_page(self):
+        buffer = io.BytesIO()
+        n_rows = append_tsv_page(buffer, [b"Ent", b"ry\nP1\nP", b"2"], True)
+        n_rows += append_tsv_page(buffer, [b"Entry", b"\nP3\n"], False)
+        n_rows += append_tsv_page(buffer, [b"Entry\n"], False)
+        self.assertEqual(buffer.getvalue(), b"Entry\nP1\nP2\nP3\n")
+        self.assertEqual(n_rows, 3)
+
+
+class TestJobPoller(unittest.TestCase):
+    def test_multiplexed_backoff(self):
+        checks = {"fast": 0, "slow": 0}
+        finished_after = {"fast": 1, "slow": 3}
+
+        def check_status(job_id):
+            checks[job_id] += 1
+            if checks[job_id] < finished_after[job_id]:
+                return json_response({"jobStatus": "RUNNING"})
+            if job_id == "slow":
+                return json_response({"jobStatus": "ERROR"})
+            return json_response({"results": [], "failedIds": ["A"]})
+
+        poller = JobPoller(None, "", initial_interval=0.01, max_interval=0.02)
+        with mock.patch.object(poller, "check_status", side_effect=check_status):
+            for job_id in checks:
+                poller.add(job_id)
+            outcomes = list(poller.poll())
+        self.assertEqual([job_id for job_id, _ in outcomes], ["fast", "slow"])
+        self.assertIsInstance(outcomes[0][1], requests.Response)
+        self.assertIsInstance(outcomes[1][1], Exception)
+        self.assertEqual(checks, {"fast": 1, "slow": 3})
+        self.assertEqual(len(poller.time_to_ready), 1)
+
+    def test_retry_after(self):
+        responses = iter(
+            [
+                json_response({}, status_code=429, headers={"Retry-After": "1"}),
+                json_response({"results": [{}], "failedIds": []}),
+            ]
+        )
+        poller = JobPoller(None, "", initial_interval=0.01)
+        with mock.patch.object(
+            poller, "check_status", side_effect=lambda _: next(responses)
+        ):
+            poller.add("job")
+            list(poller.poll())
+        self.assertGreaterEqual(poller.time_to_ready[0], 1)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from fake_uniprot import FakeUniProt
+
+from UniProtMapper import ProtMapper
+from UniProtMapper.jobs import JobRegistry, MappingJob
+
+
+class TestDetachedJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.fake = FakeUniProt(running_polls=1)
+        self.ids = ["P1", "X2", "M3"]
+
+    def _mapper(self, **kwargs):
+        mapper = ProtMapper(**kwargs)
+        self.fake.mount(mapper.session)
+        return mapper
+
+    def test_submit_and_fetch_from_another_client(self):
+        job = self._mapper().submit(self.ids, to_db="PDB")
+        self.assertEqual(self.fake.paths(), ["/idmapping/run"])
+        restored = MappingJob.from_json(job.to_json())
+        self.assertEqual(restored, job)
+
+        mapper = self._mapper()
+        self.assertEqual(mapper.job_status(restored), "RUNNING")
+        pages = list(mapper.fetch(restored))
+        self.assertEqual(len(pages), 1)
+        page, failed = pages[0]
+        self.assertEqual(page["From"].tolist(), ["P1", "M3", "M3"])
+        self.assertEqual(failed, ["X2"])
+        self.assertEqual(mapper.job_status(restored), "FINISHED")
+
+    def test_registry_reuses_jobs(self):
+        path = Path(self.tmpdir.name) / "jobs.json"
+        job = self._mapper(job_registry=JobRegistry(path)).submit(self.ids)
+        mapper = self._mapper(job_registry=JobRegistry(path))
+        self.assertEqual(mapper.submit(self.ids).job_id, job.job_id)
+        self.assertNotEqual(mapper.submit(self.ids, to_db="PDB").job_id, job.job_id)
+        self.assertEqual(len(self.fake.jobs), 2)
+        self.assertEqual(len(mapper.job_registry), 2)
+
+        del self.fake.jobs[job.job_id]  # expired on the server
+        self.assertNotEqual(mapper.submit(self.ids).job_id, job.job_id)
+        self.assertEqual(len(self.fake.paths("/idmapping/run")), 3)
+
+    def test_submit_too_many_ids(self):
+        with self.assertRaises(ValueError):
+            self._mapper().submit([f"P{i}" for i in range(501)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY = ("pandas", "numpy", "requests", "tqdm")
+
+
+def imported_heavy_modules(code):
+    """Run `code` in a fresh interpreter and return the heavy modules it imported."""
+    check = f"import sys; print('heavy:' + ','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    process = subprocess.run(
+        [sys.executable, "-c", f"{code}\n{check}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    last_line = process.stdout.strip().splitlines()[-1]
+    return [m for m in last_line[len("heavy:") :].split(",") if m]
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_package_import(self):
+        self.assertEqual(imported_heavy_modules("import UniProtMapper"), [])
+
+    def test_query_building(self):
+        code = (
+            "from UniProtMapper.uniprotkb_fields import organism_id, reviewed, xref_count\n"
+            "str(reviewed(True) & organism_id('9606') & xref_count('pdb', 1, '*'))"
+        )
+        self.assertEqual(imported_heavy_modules(code), [])
+
+    def test_cli_help(self):
+        code = (
+            "import sys; sys.argv = ['protmap', '--help']\n"
+            "from UniProtMapper.cli import main\n"
+            "try:\n    main()\nexcept SystemExit:\n    pass"
+        )
+        self.assertEqual(imported_heavy_modules(code), [])
+
+    def test_clients_load_on_access(self):
+        code = "import UniProtMapper\nUniProtMapper.ProtMapper"
+        self.assertIn("pandas", imported_heavy_modules(code))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import threading
+import unittest
+
+from UniProtMapper.pipeline import pipeline
+
+
+class TestPipeline(unittest.TestCase):
+    def test_order_and_stages(self):
+        result = pipeline(range(20), lambda x: x * 2, str, depth=2)
+        self.assertEqual(list(result), [str(x * 2) for x in range(20)])
+        result = pipeline(range(20), lambda x: x * 2, str, depth=0)
+        self.assertEqual(list(result), [str(x * 2) for x in range(20)])
+
+    def test_overlap(self):
+        """The source moves on to the next item while a stage processes the current
+        one, which would time out if they ran one after the other."""
+        fetched_next = threading.Event()
+
+        def source():
+            yield 0
+            fetched_next.set()
+            yield 1
+
+        def stage(item):
+            return item == 1 or fetched_next.wait(timeout=5)
+
+        self.assertEqual(list(pipeline(source(), stage, depth=1)), [True, True])
+
+    def test_errors(self):
+        def fail(item):
+            if item == 3:
+                raise ValueError(item)
+            return item
+
+        results = []
+        with self.assertRaises(ValueError):
+            for item in pipeline(range(10), fail, depth=2):
+                results.append(item)
+        self.assertEqual(results, [0, 1, 2])
+
+        def source():
+            yield 0
+            raise KeyError("source")
+
+        with self.assertRaises(KeyError):
+            list(pipeline(source(), str))
+
+    def test_early_stop(self):
+        produced = []
+
+        def source():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        pages = pipeline(source(), str, depth=2)
+        self.assertEqual(next(pages), "0")
+        pages.close()
+        self.assertLess(len(produced), 20)
+
+    def test_unconsumed_items_closed(self):
+        class Response:
+            def __init__(self, i):
+                self.i, self.closed = i, False
+
+            def close(self):
+                self.closed = True
+
+        def check(stop_early, stage):
+            responses = []
+
+            def source():
+                for i in range(20):
+                    responses.append(Response(i))
+                    yield responses[-1]
+
+            pages = pipeline(source(), stage, depth=2)
+            consumed = [next(pages)]
+            if stop_early:
+                pages.close()
+            else:
+                with self.assertRaises(ValueError):
+                    consumed.extend(pages)
+            for thread in threading.enumerate():  # workers exit within ~0.1 s
+                if thread is not threading.current_thread() and thread.daemon:
+                    thread.join(timeout=1)
+            self.assertGreater(len(responses), 1)
+            self.assertEqual(
+                [r.i for r in responses if not r.closed], [r.i for r in consumed]
+            )
+
+        def fail(response):
+            if response.i == 2:
+                raise ValueError(response.i)
+            return response
+
+        check(True, lambda response: response)
+        check(False, fail)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+from fake_uniprot import FakeUniProt
+
+from UniProtMapper import ProtKB
+from UniProtMapper.planner import choose_strategy, estimate_row_bytes
+
+
+class TestPlanner(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeUniProt(kb_rows=40)
+        self.protkb = ProtKB()
+        self.fake.mount(self.protkb.session)
+
+    def test_choose_strategy(self):
+        self.assertEqual(choose_strategy(10, 500), ("single page", 1))
+        self.assertEqual(choose_strategy(10_000, 500), ("stream", 1))
+        self.assertEqual(choose_strategy(10_000, 500, mode="paginate"), ("paginate", 1))
+        self.assertEqual(choose_strategy(250_000, 500), ("sharded", 3))
+        self.assertEqual(choose_strategy(5_000_000, 500), ("sharded", 8))
+        self.assertEqual(choose_strategy(250_000, 500, shards=1), ("stream", 1))
+        self.assertEqual(choose_strategy(10, 500, shards=4), ("sharded", 4))
+        self.assertEqual(choose_strategy(10, 500, mode="stream"), ("stream", 1))
+
+    def test_estimate_row_bytes(self):
+        self.assertEqual(estimate_row_bytes(["accession", "sequence"]), 369)
+        self.assertEqual(estimate_row_bytes(["length"], {"length": "Int64"}), 7)
+        self.assertEqual(estimate_row_bytes(["xref_pdb", "xref_pdb_full"]), 82)
+
+    def test_explain(self):
+        self.assertEqual(self.protkb.count("reviewed:true"), 40)
+        plan = self.protkb.explain("reviewed:true", fields=["accession"], size=15)
+        self.assertEqual(
+            (plan.rows, plan.pages, plan.bytes, plan.strategy), (40, 3, 320, "stream")
+        )
+        self.assertEqual(self.fake.paths(), ["/uniprotkb/search"] * 2)
+
+        self.protkb.shard_rows = 10
+        plan = self.protkb.explain("reviewed:true", size=15)
+        self.assertEqual((plan.strategy, plan.shards), ("sharded", 4))
+
+    def test_get_follows_plan(self):
+        fields = ["accession", "length"]
+        self.protkb.get("reviewed:true", fields=fields)  # a single page
+        self.assertEqual(self.fake.paths(), ["/uniprotkb/search"])
+
+        self.fake.log.clear()
+        expected = self.protkb.get("reviewed:true", fields=fields, size=15)
+        self.assertEqual(self.fake.paths(), ["/uniprotkb/search", "/uniprotkb/stream"])
+
+        self.fake.log.clear()
+        self.protkb.shard_rows = 10
+        df = self.protkb.get("reviewed:true", fields=fields, size=15)
+        self.assertTrue(df.equals(expected))
+        # a preflight page, the counts of the planner, then a single page per shard
+        shard_queries = [
+            params["query"]
+            for _, _, params in self.fake.log
+            if params.get("size") == "15" and "length:[" in params["query"]
+        ]
+        self.assertEqual(len(shard_queries), 4)
+        # the pool fits the pages prefetched by the concurrent shards
+        self.assertEqual(self.protkb._pool_maxsize, 4 * (self.protkb.prefetch + 2))
+        self.assertEqual(self.fake.paths("/uniprotkb/stream"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from UniProtMapper import ProtMapper
+from UniProtMapper.registry import get_registry
+from UniProtMapper.uniprotkb_fields import xref_count
+from UniProtMapper.utils import read_fields_table, supported_mapping_dbs
+
+
+class TestRegistry(unittest.TestCase):
+    def test_matches_resources(self):
+        registry = get_registry()
+        table = read_fields_table()
+        self.assertEqual(
+            registry.return_fields_order[: len(table)],
+            tuple(table["returned_field"]),
+        )
+        self.assertIn("xref_pdb_full", registry.return_fields)
+        self.assertEqual(list(registry.mapping_dbs_order), supported_mapping_dbs())
+        self.assertEqual(registry.label_dtypes["Length"], "Int64")
+        self.assertIs(get_registry(), registry)
+
+    def test_immutable(self):
+        registry = get_registry()
+        with self.assertRaises(TypeError):
+            registry.label_dtypes["Length"] = "string"
+        with self.assertRaises(AttributeError):
+            registry.mapping_dbs = frozenset()
+
+    def test_validation(self):
+        mapper = ProtMapper()
+        self.assertEqual(
+            mapper._validate_fields(["Accession", "go_id"]), ["accession", "go_id"]
+        )
+        self.assertEqual(mapper._validate_fields("length"), ["length"])
+        with self.assertRaises(ValueError):
+            mapper._validate_fields(["accession", "not_a_field"])
+        with self.assertRaises(ValueError):
+            mapper._prepare_fields(None, "UniProtKB_AC-ID", "NotADatabase")
+        self.assertEqual(str(xref_count("pdb", 1, "*")), "xref_count_pdb:[1 TO *]")
+        with self.assertRaises(ValueError):
+            xref_count("not_a_database", 1, "*")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from fake_uniprot import FakeUniProt
+
+from UniProtMapper import ProtKB
+from UniProtMapper.sharding import plan_shards
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeUniProt(kb_rows=40, page_size=3)  # lengths 50 to 440
+        self.protkb = ProtKB()
+        self.fake.mount(self.protkb.session)
+
+    def test_plan_shards(self):
+        shards = plan_shards("reviewed:true", self.protkb.count, 4, min_count=3)
+        self.assertEqual(len(shards), 4)
+        self.assertEqual(sum(shard.count for shard in shards), 40)
+        self.assertEqual(
+            [self.protkb.count(shard.query) for shard in shards],
+            [shard.count for shard in shards],
+        )
+        self.assertEqual(shards[0].query, "(reviewed:true) AND length:[0 TO 124]")
+        # fewer results than `min_count`: not split
+        self.assertEqual(len(plan_shards("reviewed:true", self.protkb.count, 4)), 1)
+        with self.assertRaises(ValueError):
+            plan_shards("reviewed:true", self.protkb.count, 4, field="organism_id")
+
+    def test_sharded_get(self):
+        fields = ["accession", "length"]
+        expected = self.protkb.get("reviewed:true", fields=fields, size=3)
+        self.fake.log.clear()
+        result = self.protkb.get("reviewed:true", fields=fields, size=3, shards=4)
+        self.assertTrue(result.equals(expected))
+        first_pages = [
+            params["query"]
+            for _, _, params in self.fake.log
+            if params.get("size") == "3" and "cursor" not in params
+        ]
+        self.assertEqual(len(first_pages), 4)  # one per shard
+        self.assertTrue(all("length:[" in query for query in first_pages))
+
+
+if __name__ == "__main__":
+    unittest.main()
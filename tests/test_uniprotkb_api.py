@@ -1,6 +1,7 @@
 import unittest
 
 import pandas as pd
+from fake_uniprot import FakeUniProt
 
 from UniProtMapper.uniprotkb_api import ProtKB
 from UniProtMapper.uniprotkb_fields import accession
@@ -110,8 +111,100 @@ class TestProtKB(unittest.TestCase):
             self.assertTrue(col in returned_cols)
 
 
-if __name__ == "__main__":
-    unittest.main()
+class TestProtKBTyped(unittest.TestCase):
+    def test_typed_columns(self):
+        protkb = ProtKB(typed=True)
+        FakeUniProt().mount(protkb.session)
+        df = protkb.get("reviewed:true", fields=["accession", "length", "organism_id"])
+        self.assertEqual(str(df["Length"].dtype), "Int64")
+        self.assertEqual(str(df["Organism (ID)"].dtype), "Int64")
+        self.assertIsInstance(df["Entry"].dtype, pd.StringDtype)
+        self.assertEqual(df["Length"].tolist(), [50, 60, 70, 80, 90])
+
+    def test_streamed_pages(self):
+        protkb = ProtKB()
+        FakeUniProt(page_size=2).mount(protkb.session)
+        fields = ["accession", "length"]
+        df = protkb.get("reviewed:true", fields=fields, compressed=True, size=2)
+        self.assertEqual(len(df), 5)
+        self.assertEqual(df["Length"].tolist(), [50, 60, 70, 80, 90])
+        pd.testing.assert_frame_equal(
+            df, protkb.get("reviewed:true", fields=fields, size=2)
+        )
+
+
+class TestProtKBModes(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeUniProt(page_size=2)
+        self.protkb = ProtKB()
+        self.fake.mount(self.protkb.session)
+
+    def _get(self, mode, compressed=False):
+        self.fake.log.clear()
+        return self.protkb.get(
+            "reviewed:true",
+            fields=["accession", "length"],
+            size=2,
+            compressed=compressed,
+            mode=mode,
+        )
+
+    def test_modes(self):
+        expected = self._get("paginate")
+        self.assertEqual(self.fake.paths(), ["/uniprotkb/search"] * 3)
+        for compressed in [True, False]:
+            df = self._get("stream", compressed=compressed)
+            pd.testing.assert_frame_equal(df, expected)
+            self.assertEqual(self.fake.paths(), ["/uniprotkb/stream"])
+        # more results than a page: only the headers of the first page are read
+        pd.testing.assert_frame_equal(self._get("auto"), expected)
+        self.assertEqual(self.fake.paths(), ["/uniprotkb/search", "/uniprotkb/stream"])
+        self.protkb.stream_limit = 4
+        self._get("auto")
+        self.assertEqual(self.fake.paths(), ["/uniprotkb/search"] * 3)
+        with self.assertRaises(ValueError):
+            self._get("scroll")
+
+    def test_stream_parsed_in_chunks(self):
+        protkb = ProtKB(typed=True)
+        self.fake.mount(protkb.session)
+        fields = ["accession", "length"]
+        url = protkb._build_search_url(
+            "reviewed:true", fields, compressed=True, endpoint="stream"
+        )
+        df = protkb._fetch_stream(url, compressed=True, progress=False, rows=2)
+        expected = protkb.get("reviewed:true", fields, size=2, mode="paginate")
+        pd.testing.assert_frame_equal(df, expected)
+
+
+class TestProtKBPages(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeUniProt(kb_rows=7)
+        self.protkb = ProtKB(typed=True)
+        self.fake.mount(self.protkb.session)
+        self.fields = ["accession", "length"]
+
+    def test_iter_pages(self):
+        pages = list(self.protkb.iter_pages("reviewed:true", self.fields, size=3))
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(str(pages[0]["Length"].dtype), "Int64")
+        self.assertEqual(len(self.fake.paths()), 3)
+
+    def test_limit(self):
+        pages = self.protkb.iter_pages("reviewed:true", self.fields, size=3, limit=4)
+        self.assertEqual([len(page) for page in pages], [3, 1])
+        self.assertEqual(len(self.fake.paths()), 2)
+
+        self.fake.log.clear()
+        self.protkb.prefetch = 0  # no page is downloaded ahead of the consumer
+        first = next(self.protkb.iter_pages("reviewed:true", self.fields, size=3))
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(self.fake.paths()), 1)
+        self.protkb.prefetch = 2
+
+        df = self.protkb.get("reviewed:true", self.fields, size=3, limit=5)
+        expected = self.protkb.get("reviewed:true", self.fields).head(5)
+        pd.testing.assert_frame_equal(df, expected)
 
 
 if __name__ == "__main__":